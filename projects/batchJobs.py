@@ -0,0 +1,100 @@
+import sys
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Exit codes of a batch run
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def iter_jobs(source, key, options):
+    """Yield (line number, job, error) for every job in a jobs file, '-' reads stdin.
+
+    A line is either a plain path or URL, stored under `key`, or a JSON object
+    with `key` and any of `options`, a dict of option names and their types.
+    Blank lines and lines starting with # are skipped. Invalid lines are
+    yielded with job None and an error message. The file is read line by
+    line, so jobs can be streamed in while earlier ones are processed.
+    """
+    stream = sys.stdin if source == '-' else open(source, encoding='utf-8')
+    try:
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if not line.startswith('{'):
+                yield number, {key: line}, None
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                yield number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(job, dict) or not isinstance(job.get(key), str):
+                yield number, None, f"Job needs a '{key}'"
+                continue
+            unknown = sorted(set(job) - set(options) - {key})
+            if unknown:
+                yield number, None, f"Unknown option(s): {', '.join(unknown)}"
+                continue
+            wrong = [name for name, value in job.items() if name != key and not isinstance(value, options[name])]
+            if wrong:
+                yield number, None, f"Wrong type for option(s): {', '.join(wrong)}"
+                continue
+            yield number, job, None
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class ResultWriter:
+    """Write one JSON line per finished item and count the items by status.
+
+    Every record is flushed right away, so a consumer sees each item as soon
+    as it is done. close() appends a summary line with the counts and returns
+    the exit code: EXIT_FAILED if any record had one of `failed_statuses`.
+    Records may be written from several threads.
+    """
+
+    def __init__(self, path='-', failed_statuses=('error',)):
+        self.stream = sys.stdout if path == '-' else open(path, 'a', encoding='utf-8')
+        self.failed_statuses = failed_statuses
+        self.counts = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            status = record['status']
+            self.counts[status] = self.counts.get(status, 0) + 1
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    @property
+    def failed(self):
+        return sum(self.counts.get(status, 0) for status in self.failed_statuses)
+
+    def summary(self):
+        return {
+            'total': sum(self.counts.values()),
+            'failed': self.failed,
+            'counts': dict(sorted(self.counts.items())),
+            'elapsed': round(time.monotonic() - self.started, 3),
+        }
+
+    def close(self):
+        summary = self.summary()
+        with self._lock:
+            self.stream.write(json.dumps({'summary': summary}) + '\n')
+            self.stream.flush()
+            if self.stream is not sys.stdout:
+                self.stream.close()
+        counts = ', '.join(f"{status}: {count}" for status, count in summary['counts'].items())
+        logger.info(f"Batch finished: {summary['total']} items ({counts or 'none'}) in {summary['elapsed']:.1f}s")
+        return EXIT_FAILED if summary['failed'] else EXIT_OK
@@ -0,0 +1,363 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import datetime
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent
+DEFAULT_KEYWORDS = PROJECT_DIR / 'components' / 'keywords.txt'
+
+GERMAN_MONTHS = ['Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli',
+                 'August', 'September', 'Oktober', 'November', 'Dezember']
+SENDERS = ['Stadtwerke Musterstadt GmbH', 'Finanzamt Musterstadt', 'Allgemeine Ortskrankenkasse',
+           'Sparkasse Musterstadt', 'Dr. med. Erika Beispiel', 'Hausverwaltung Schmidt & Partner']
+FILLER = ('Sehr geehrte Damen und Herren, wir bedanken uns für Ihr Schreiben und teilen Ihnen mit, '
+          'dass die Bearbeitung Ihres Anliegens abgeschlossen ist. Bitte bewahren Sie dieses Schreiben '
+          'für Ihre Unterlagen auf. Bei Rückfragen stehen wir Ihnen gerne zur Verfügung.')
+
+# Where the letter date is placed, the extraction has to work harder for the later ones
+DATE_PLACEMENTS = ['header', 'ort_datum', 'signature', 'body', 'second_page', 'filename', 'none']
+
+
+def _pdf_string(text):
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return escaped.encode('cp1252', errors='replace')
+
+
+def write_pdf(path, pages, padding=0):
+    """Write a minimal uncompressed PDF with one text line per list entry and page.
+
+    padding adds vector drawing operators to the first page (invisible to text
+    extraction) to grow the file like scanned plans or drawings do.
+    """
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'.encode())
+    objects.append(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+
+    for number, lines in enumerate(pages):
+        content = b'BT /F1 11 Tf 14 TL 56 790 Td ' + b' '.join(b'(' + _pdf_string(line) + b') Tj T*' for line in lines) + b' ET'
+        if number == 0 and padding:
+            rng = random.Random(padding)
+            strokes = []
+            size = 0
+            while size < padding:
+                stroke = f'{rng.randint(0, 595)} {rng.randint(0, 842)} m {rng.randint(0, 595)} {rng.randint(0, 842)} l S\n'
+                strokes.append(stroke)
+                size += len(stroke)
+            content = b'q 0.1 w\n' + ''.join(strokes).encode() + b'Q\n' + content
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * number} 0 R >>'.encode()
+        )
+        objects.append(b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as file:
+        file.write(output)
+
+
+def _format_date(rng, date):
+    style = rng.randrange(4)
+    if style == 0:
+        return date.strftime('%d.%m.%Y')
+    if style == 1:
+        return f"{date.day}. {GERMAN_MONTHS[date.month - 1]} {date.year}"
+    if style == 2:
+        return date.strftime('%Y-%m-%d')
+    return f"{date.day}/{date.month}/{date.year}"
+
+
+def generate_letter(rng, keywords, index):
+    """Return (filename, pages, padding, expected date) for one synthetic German letter."""
+    date = datetime.date(2015, 1, 1) + datetime.timedelta(days=rng.randrange(3650))
+    date_text = _format_date(rng, date)
+    placement = rng.choice(DATE_PLACEMENTS)
+    page_count = rng.choice([1, 1, 1, 2, 2, 3, 5, 8])
+    keyword_count = rng.choice([0, 1, 1, 2, 5, 20])
+
+    def body_lines(count):
+        words = FILLER.split()
+        lines = []
+        for _ in range(count):
+            line = words[rng.randrange(len(words) - 10):]
+            line = line[:rng.randint(6, 10)]
+            if keywords and rng.random() < keyword_count / 40:
+                line.insert(rng.randrange(len(line)), rng.choice(keywords))
+            lines.append(' '.join(line))
+        return lines
+
+    first = [rng.choice(SENDERS), 'Musterstraße 12', '12345 Musterstadt', '']
+    if placement == 'header':
+        first.append(f"Musterstadt, {date_text}")
+    if keywords and keyword_count:
+        first.append(f"{rng.choice(keywords)} Nr. {rng.randint(1000, 99999)}")
+    first.extend(body_lines(rng.randint(8, 30)))
+    if placement == 'body':
+        first.insert(len(first) // 2, f"Die Frist endet am {date_text} um 24 Uhr")
+    if placement == 'ort_datum':
+        first.append(f"Ort, Datum: Musterstadt, {date_text}")
+    if placement == 'signature':
+        first.append(f"Unterschrift {date_text}")
+
+    pages = [first]
+    for number in range(1, page_count):
+        lines = [f"Seite {number + 1} von {page_count}"] + body_lines(rng.randint(20, 45))
+        if placement == 'second_page' and number == 1:
+            lines.append(f"Datum, Ort: {date_text} Musterstadt")
+        pages.append(lines)
+
+    if placement == 'filename':
+        filename = f"{date.strftime('%Y%m%d')}_scan_{index:05d}.pdf"
+    else:
+        filename = f"scan_{index:05d}.pdf"
+    padding = rng.choice([0, 0, 0, 20_000, 200_000, 2_000_000])
+    expected = None if placement == 'none' or (placement == 'second_page' and page_count < 2) else date
+    return filename, pages, padding, expected
+
+
+def generate_corpus(output_dir, count, seed=42, keywords_file=DEFAULT_KEYWORDS):
+    """Write a reproducible corpus of synthetic letters and a manifest.json describing it."""
+    rng = random.Random(seed)
+    with open(keywords_file, 'r', encoding='utf-8') as file:
+        keywords = [line.strip() for line in file if line.strip()]
+
+    output = Path(output_dir)
+    if output.exists():
+        shutil.rmtree(output)
+    output.mkdir(parents=True)
+
+    manifest = []
+    for index in range(count):
+        filename, pages, padding, expected = generate_letter(rng, keywords, index)
+        write_pdf(output / filename, pages, padding)
+        manifest.append({
+            'file': filename,
+            'pages': len(pages),
+            'bytes': (output / filename).stat().st_size,
+            'date': expected.isoformat() if expected else None,
+        })
+    with open(output / 'manifest.json', 'w', encoding='utf-8') as file:
+        json.dump({'seed': seed, 'count': count, 'files': manifest}, file, indent=2)
+    return manifest
+
+
+def _timeit(function, repeat, number):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'mean_s': statistics.mean(timings),
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def run_micro(corpus_dir, keywords_file, repeat=5):
+    """Time the regex and dateparser paths of pdfRename on text extracted from the corpus."""
+    sys.path.insert(0, str(PROJECT_DIR))
+    import pdfplumber
+    import pdfRename
+
+    texts = []
+    for path in sorted(Path(corpus_dir).glob('*.pdf'))[:50]:
+        with pdfplumber.open(path) as pdf:
+            texts.append((str(path), ''.join(page.extract_text() or '' for page in pdf.pages[:3])))
+
+    date_strings = [pdfRename.find_date_string(text) for _, text in texts]
+    date_strings = [value for value in date_strings if value]
+    month_names = [value for value in date_strings if any(char.isalpha() for char in value)] or ['3. März 2021']
+
+    def uncached_dateparser():
+        import dateparser
+        for value in month_names:
+            dateparser.parse(value, languages=['de'])
+
+    results = {
+        'find_date_string': _timeit(lambda: [pdfRename.find_date_string(text) for _, text in texts], repeat, 3),
+        'extract_date': _timeit(lambda: [pdfRename.extract_date(text, path) for path, text in texts], repeat, 3),
+        'parse_date_numeric': _timeit(lambda: [pdfRename.parse_date(value) for value in date_strings], repeat, 10),
+        'dateparser_month_names': _timeit(uncached_dateparser, repeat, 1),
+        'extract_title': _timeit(lambda: [pdfRename.extract_title(text, keywords_file) for _, text in texts], repeat, 3),
+    }
+    for result in results.values():
+        result['items'] = len(texts)
+    return results
+
+
+def _run_measured(command):
+    """Run command, return (seconds, peak RSS in KiB, return code) for that child alone."""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, cwd=PROJECT_DIR.parent)
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+        # ru_maxrss is in bytes on macOS and in KiB elsewhere
+        peak = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+        return elapsed, peak, os.waitstatus_to_exitcode(status)
+    returncode = process.wait()
+    return time.perf_counter() - start, None, returncode
+
+
+def _copy_with_dated_names(corpus_dir, scratch):
+    """Copy the corpus to scratch, naming every file after one of editCreationDate's filename patterns.
+
+    Most generated names are scan_NNNNN.pdf, which editCreationDate skips, so
+    its run would mostly measure skipped files. Files without a date in the
+    manifest get a random one from the corpus seed.
+    """
+    with open(Path(corpus_dir) / 'manifest.json', 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    rng = random.Random(manifest['seed'])
+    scratch.mkdir(parents=True)
+    for index, entry in enumerate(manifest['files']):
+        if entry['date']:
+            date = datetime.date.fromisoformat(entry['date'])
+        else:
+            date = datetime.date(2015, 1, 1) + datetime.timedelta(days=rng.randrange(3650))
+        # The three patterns: YYYYMMDD_*.pdf, YYYY-MM-DD_*.pdf and *_YYYYMMDD.pdf
+        name = [f"{date:%Y%m%d}_letter_{index:05d}.pdf", f"{date:%Y-%m-%d}_letter_{index:05d}.pdf",
+                f"letter_{index:05d}_{date:%Y%m%d}.pdf"][index % 3]
+        shutil.copy2(Path(corpus_dir) / entry['file'], scratch / name)
+
+
+def run_end_to_end(corpus_dir, keywords_file, workers=(1,)):
+    """Measure files/sec and peak RSS of both tools over a scratch copy of the corpus."""
+    files = len(list(Path(corpus_dir).glob('*.pdf')))
+    scratch = Path(corpus_dir).with_name(Path(corpus_dir).name + '_scratch')
+    results = {}
+
+    for count in workers:
+        shutil.rmtree(scratch, ignore_errors=True)
+        shutil.copytree(corpus_dir, scratch)
+        elapsed, peak, code = _run_measured([
+            sys.executable, str(PROJECT_DIR / 'pdfRename.py'), '--dry-run', '-k', str(keywords_file),
+            '-w', str(count), str(scratch)
+        ])
+        results[f'pdfRename_w{count}'] = {
+            'files': files, 'seconds': elapsed, 'files_per_s': files / elapsed if elapsed else None,
+            'peak_rss_kib': peak, 'returncode': code,
+        }
+
+    shutil.rmtree(scratch, ignore_errors=True)
+    _copy_with_dated_names(corpus_dir, scratch)
+    # With a folder argument editCreationDate processes it and exits without prompting
+    elapsed, peak, code = _run_measured([sys.executable, str(PROJECT_DIR / 'editCreationDate.py'), str(scratch)])
+    results['editCreationDate'] = {
+        'files': files, 'seconds': elapsed, 'files_per_s': files / elapsed if elapsed else None,
+        'peak_rss_kib': peak, 'returncode': code,
+    }
+    shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_file, candidate_file):
+    with open(baseline_file, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    with open(candidate_file, 'r', encoding='utf-8') as file:
+        candidate = json.load(file)
+
+    print(f"{'benchmark':<32} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for section, key in (('micro', 'median_s'), ('end_to_end', 'seconds')):
+        for name, result in baseline.get(section, {}).items():
+            other = candidate.get(section, {}).get(name)
+            if not other:
+                continue
+            before, after = result[key], other[key]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{section + '.' + name:<32} {before:>11.4f}s {after:>11.4f}s {change:>+8.1f}%")
+        for name, result in baseline.get(section, {}).items():
+            other = candidate.get(section, {}).get(name)
+            if other and result.get('peak_rss_kib') and other.get('peak_rss_kib'):
+                print(f"{section + '.' + name + ' RSS':<32} {result['peak_rss_kib']:>10}Ki {other['peak_rss_kib']:>10}Ki")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmarks for pdfRename and editCreationDate')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help='Generate a synthetic corpus of German letters')
+    generate.add_argument('corpus', help='Output folder (replaced if it exists)')
+    generate.add_argument('-n', '--count', type=int, default=200, help='Number of PDFs (default: 200)')
+    generate.add_argument('-s', '--seed', type=int, default=42, help='Random seed (default: 42)')
+
+    run = subparsers.add_parser('run', help='Run the benchmarks and write a JSON result file')
+    run.add_argument('corpus', help='Corpus folder created by "generate"')
+    run.add_argument('-o', '--output', default='benchmark.json', help='Result file (default: benchmark.json)')
+    run.add_argument('-k', '--keywords', default=str(DEFAULT_KEYWORDS), help='Keywords file')
+    run.add_argument('--repeat', type=int, default=5, help='Repetitions of each micro-benchmark (default: 5)')
+    run.add_argument('--workers', type=int, nargs='+', default=[1],
+                     help='Worker counts for the end-to-end pdfRename runs (default: 1)')
+    run.add_argument('--skip-micro', action='store_true', help='Only run the end-to-end benchmarks')
+    run.add_argument('--skip-e2e', action='store_true', help='Only run the micro-benchmarks')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.command == 'generate':
+        manifest = generate_corpus(args.corpus, args.count, args.seed)
+        size = sum(entry['bytes'] for entry in manifest)
+        print(f"Generated {len(manifest)} PDFs ({size / 1024 / 1024:.1f} MiB) in {args.corpus}")
+
+    elif args.command == 'run':
+        results = {
+            'meta': {
+                'revision': _git_revision(),
+                'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'corpus': str(args.corpus),
+            },
+        }
+        # End-to-end runs first: on Linux a child's peak RSS starts at the parent's,
+        # so they have to run before the micro-benchmarks load pdfplumber here
+        if not args.skip_e2e:
+            results['end_to_end'] = run_end_to_end(args.corpus, args.keywords, args.workers)
+        if not args.skip_micro:
+            results['micro'] = run_micro(args.corpus, args.keywords, args.repeat)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    elif args.command == 'compare':
+        compare(args.baseline, args.candidate)
+
+
+if __name__ == '__main__':
+    main()
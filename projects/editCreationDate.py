@@ -4,9 +4,16 @@ import datetime
 import platform
 import argparse
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import SimpleNamespace
 from tqdm import tqdm
 
+from fileWalker import PdfDiscovery
+from batchJobs import EXIT_USAGE, ResultWriter, iter_jobs
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -17,8 +24,9 @@ logger = logging.getLogger('file_date_editor')
 # Platform-specific imports
 if platform.system() == 'Windows':
     try:
-        import win32com.client
-        shell = win32com.client.Dispatch("Shell.Application")
+        import pywintypes
+        import win32con
+        import win32file
     except ImportError:
         logger.error("Required package 'pywin32' is not installed. Please install it using: pip install pywin32")
         logger.error("After installation, run: python -m pip install --upgrade pywin32")
@@ -26,112 +34,463 @@ if platform.system() == 'Windows':
 elif platform.system() == 'Darwin':  # macOS
     import subprocess
 
-def update_file_creation_date(filepath, dry_run=False):
-    """Update a file's creation date based on its filename."""
-    filename = os.path.basename(filepath)
+SYSTEM = platform.system()
 
-    # Support multiple filename patterns
-    patterns = [
-        r'^(\d{4})(\d{2})(\d{2})_.*\.pdf$',  # YYYYMMDD_*.pdf
-        r'^(\d{4})-(\d{2})-(\d{2})_.*\.pdf$',  # YYYY-MM-DD_*.pdf
-        r'^.*_(\d{4})(\d{2})(\d{2})\.pdf$'    # *_YYYYMMDD.pdf
-    ]
-    
-    for pattern in patterns:
-        match = re.match(pattern, filename)
-        if match:
-            year = int(match.group(1))
-            month = int(match.group(2))
-            day = int(match.group(3))
+# Supported filename patterns, compiled once. Case-insensitive, as the
+# folder walker also finds .PDF files.
+FILENAME_PATTERNS = [
+    re.compile(r'^(\d{4})(\d{2})(\d{2})_.*\.pdf$', re.IGNORECASE),  # YYYYMMDD_*.pdf
+    re.compile(r'^(\d{4})-(\d{2})-(\d{2})_.*\.pdf$', re.IGNORECASE),  # YYYY-MM-DD_*.pdf
+    re.compile(r'^.*_(\d{4})(\d{2})(\d{2})\.pdf$', re.IGNORECASE)    # *_YYYYMMDD.pdf
+]
 
-            # Validate date
-            try:
-                date_time = datetime.datetime(year, month, day)
-            except ValueError:
-                logger.warning(f"Invalid date in filename: {filename}")
-                return False
+# Results of inspect_file() and set_file_date()
+STALE = 'stale'
+UNCHANGED = 'unchanged'
+UPDATED = 'updated'
+FAILED = 'failed'
+
+def _timestamp_ns(date_time):
+    return int(date_time.timestamp()) * 1_000_000_000
+
+def _birthtime(stat):
+    # Windows reports the creation time as st_ctime before Python 3.12
+    return getattr(stat, 'st_birthtime', stat.st_ctime if SYSTEM == 'Windows' else None)
+
+class TimestampBackend:
+    """Base class of the backends that decide which timestamps are written.
+
+    Files are addressed by name relative to an open directory fd where the
+    platform supports it, so a deep tree costs one path lookup per folder
+    instead of one per file.
+    """
+
+    name = None
+    thread_safe = True
+    uses_dir_fd = os.utime in os.supports_dir_fd and os.stat in os.supports_dir_fd
+
+    def __init__(self, modified_date=False):
+        self.modified_date = modified_date
+
+    def stat(self, filepath, dir_fd=None):
+        if dir_fd is not None:
+            return os.stat(os.path.basename(filepath), dir_fd=dir_fd)
+        return os.stat(filepath)
+
+    def is_current(self, stat, date_time):
+        raise NotImplementedError
+
+    def apply(self, filepath, date_time, stat, dir_fd=None):
+        raise NotImplementedError
+
+    def _utime(self, filepath, atime_ns, mtime_ns, dir_fd=None):
+        if dir_fd is not None:
+            os.utime(os.path.basename(filepath), ns=(atime_ns, mtime_ns), dir_fd=dir_fd)
+        else:
+            os.utime(filepath, ns=(atime_ns, mtime_ns))
+
+class MtimeBackend(TimestampBackend):
+    """Writes the modification time only, the access time is kept."""
+
+    name = 'mtime'
+
+    def is_current(self, stat, date_time):
+        return stat.st_mtime_ns == _timestamp_ns(date_time)
+
+    def apply(self, filepath, date_time, stat, dir_fd=None):
+        self._utime(filepath, stat.st_atime_ns, _timestamp_ns(date_time), dir_fd)
+
+class AtimeMtimeBackend(TimestampBackend):
+    """Writes access and modification time."""
+
+    name = 'atime-mtime'
+
+    def is_current(self, stat, date_time):
+        target = _timestamp_ns(date_time)
+        return stat.st_atime_ns == target and stat.st_mtime_ns == target
+
+    def apply(self, filepath, date_time, stat, dir_fd=None):
+        target = _timestamp_ns(date_time)
+        self._utime(filepath, target, target, dir_fd)
+
+class BirthtimeBackend(TimestampBackend):
+    """Writes the creation (birth) time, and the modification time with modified_date.
 
-            if dry_run:
-                logger.info(f"Would set creation date of {filename} to {date_time.strftime('%Y-%m-%d')}")
-                return True
+    Supported on macOS (SetFile from the Xcode command line tools) and Windows.
+    """
 
+    name = 'birthtime'
+    # SetFile and CreateFile take full paths
+    uses_dir_fd = False
+
+    @staticmethod
+    def supported():
+        return SYSTEM in ('Darwin', 'Windows')
+
+    def is_current(self, stat, date_time):
+        if _birthtime(stat) != date_time.timestamp():
+            return False
+        return not self.modified_date or stat.st_mtime_ns == _timestamp_ns(date_time)
+
+    def apply(self, filepath, date_time, stat, dir_fd=None):
+        if SYSTEM == 'Windows':
+            handle = win32file.CreateFile(
+                str(filepath), win32con.FILE_WRITE_ATTRIBUTES,
+                win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
+                None, win32con.OPEN_EXISTING, win32con.FILE_ATTRIBUTE_NORMAL, None
+            )
             try:
-                if platform.system() == 'Windows':
-                    folder = shell.NameSpace(os.path.dirname(filepath))
-                    item = folder.ParseName(os.path.basename(filepath))
-                    if item is not None:
-                        item.ModifyDate = date_time.strftime("%Y-%m-%d %H:%M:%S")
-                elif platform.system() == 'Darwin':  # macOS
-                    # Format date for SetFile command
-                    date_str = date_time.strftime("%m/%d/%Y %H:%M:%S")
-                    subprocess.run(['SetFile', '-d', date_str, str(filepath)], check=True)
-                else:  # Unix/Linux
-                    epoch_time = date_time.timestamp()
-                    os.utime(filepath, (epoch_time, epoch_time))
-                
-                logger.debug(f"Updated creation date for {filename} to {date_time.strftime('%Y-%m-%d')}")
-                return True
-            except Exception as e:
-                logger.error(f"Error updating {filename}: {str(e)}")
-                return False
-                
-    logger.info(f"Filename {filename} doesn't match any supported pattern")
-    return False
+                file_time = pywintypes.Time(date_time)
+                win32file.SetFileTime(handle, file_time, None, file_time if self.modified_date else None)
+            finally:
+                handle.Close()
+            return
+
+        # Format date for SetFile command
+        date_str = date_time.strftime("%m/%d/%Y %H:%M:%S")
+        subprocess.run(['SetFile', '-d', date_str, str(filepath)], check=True)
+        if self.modified_date:
+            self._utime(filepath, stat.st_atime_ns, _timestamp_ns(date_time))
+
+class FakeBackend(MtimeBackend):
+    """Records writes in memory instead of touching files, for testing the batch logic.
+
+    Behaves like the mtime backend. stats maps paths to stat results used
+    instead of os.stat(); written dates end up there as well, so a second
+    run over the same files finds them already correct.
+    """
+
+    name = 'fake'
+    uses_dir_fd = False
+
+    def __init__(self, modified_date=False, stats=None):
+        super().__init__(modified_date)
+        self.stats = dict(stats or {})
+        self.writes = []
+        self._lock = threading.Lock()
+
+    def stat(self, filepath, dir_fd=None):
+        with self._lock:
+            if filepath in self.stats:
+                return self.stats[filepath]
+        return super().stat(filepath, dir_fd)
 
-def process_folder(folder_path, recursive=False, modify_modified_date=False, dry_run=False):
-    """Process all PDF files in the given folder and optionally its subfolders."""
+    def apply(self, filepath, date_time, stat, dir_fd=None):
+        logger.info(f"Fake backend: setting modified date of {os.path.basename(filepath)} "
+                    f"to {date_time.strftime('%Y-%m-%d')}")
+        with self._lock:
+            self.writes.append((filepath, date_time))
+            self.stats[filepath] = SimpleNamespace(
+                st_atime_ns=stat.st_atime_ns, st_mtime_ns=_timestamp_ns(date_time), st_ctime=stat.st_ctime
+            )
+
+BACKENDS = {backend.name: backend for backend in (MtimeBackend, AtimeMtimeBackend, BirthtimeBackend, FakeBackend)}
+
+def resolve_backend(name='auto', modified_date=False):
+    """Return the timestamp backend by name; 'auto' picks the birth time where it can be set, else mtime."""
+    if name == 'auto':
+        name = 'birthtime' if BirthtimeBackend.supported() else 'mtime'
+    if name == 'birthtime' and not BirthtimeBackend.supported():
+        raise ValueError(f"Birth time cannot be set on {SYSTEM}")
+    return BACKENDS[name](modified_date)
+
+class DirectoryHandles:
+    """Open directory fds, reused for all files of a folder."""
+
+    def __init__(self, limit=64):
+        self.limit = limit
+        self.fds = {}
+
+    def get(self, filepath):
+        folder = os.path.dirname(os.path.abspath(filepath))
+        fd = self.fds.get(folder)
+        if fd is None:
+            fd = os.open(folder, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+            self.fds[folder] = fd
+        return fd
+
+    @property
+    def full(self):
+        return len(self.fds) >= self.limit
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds.clear()
+
+def date_from_filename(filename):
+    """Return the date encoded in a filename, None if no pattern matches.
+
+    Raises ValueError if a pattern matches but the date does not exist.
+    """
+    for pattern in FILENAME_PATTERNS:
+        match = pattern.match(filename)
+        if match:
+            year, month, day = (int(group) for group in match.groups())
+            return datetime.datetime(year, month, day)
+    return None
+
+def _logged_date_from_filename(filepath):
+    filename = os.path.basename(filepath)
+    try:
+        date_time = date_from_filename(filename)
+    except ValueError:
+        logger.warning(f"Invalid date in filename: {filename}")
+        return None
+    if date_time is None:
+        logger.info(f"Filename {filename} doesn't match any supported pattern")
+    return date_time
+
+def inspect_file(filepath, backend, dir_fd=None):
+    """Return the date for a file, STALE, UNCHANGED or FAILED and its stat, without writing anything."""
+    date_time = _logged_date_from_filename(filepath)
+    if date_time is None:
+        return None, FAILED, None
+    return (date_time, *check_file(filepath, date_time, backend, dir_fd))
+
+def check_file(filepath, date_time, backend, dir_fd=None):
+    """Return STALE, UNCHANGED or FAILED for a file and the given date, and the file's stat."""
+    try:
+        stat = backend.stat(filepath, dir_fd)
+    except OSError as e:
+        logger.error(f"Error updating {os.path.basename(filepath)}: {str(e)}")
+        return FAILED, None
+    if backend.is_current(stat, date_time):
+        return UNCHANGED, stat
+    return STALE, stat
+
+def write_timestamp(filepath, date_time, backend, stat, dir_fd=None):
+    """Write the date to a file with the given backend."""
+    filename = os.path.basename(filepath)
+    try:
+        backend.apply(filepath, date_time, stat, dir_fd)
+        logger.debug(f"Updated creation date for {filename} to {date_time.strftime('%Y-%m-%d')}")
+        return True
+    except Exception as e:
+        logger.error(f"Error updating {filename}: {str(e)}")
+        return False
+
+def set_file_date(filepath, date_time, dry_run=False, backend=None, dir_fd=None):
+    """Set a file's timestamps to date_time unless they already match; returns UPDATED, UNCHANGED or FAILED."""
+    backend = backend or resolve_backend()
+    status, stat = check_file(filepath, date_time, backend, dir_fd)
+    if status != STALE:
+        if status == UNCHANGED:
+            logger.debug(f"Creation date of {os.path.basename(filepath)} is already {date_time.strftime('%Y-%m-%d')}")
+        return status
+    if dry_run:
+        logger.info(f"Would set creation date of {os.path.basename(filepath)} to {date_time.strftime('%Y-%m-%d')}")
+        return UPDATED
+    return UPDATED if write_timestamp(filepath, date_time, backend, stat, dir_fd) else FAILED
+
+def update_file_creation_date(filepath, dry_run=False, backend=None):
+    """Update a file's creation date based on its filename."""
+    date_time = _logged_date_from_filename(filepath)
+    if date_time is None:
+        return False
+    return set_file_date(filepath, date_time, dry_run, backend) != FAILED
+
+def process_folder(folder_path, recursive=False, modify_modified_date=False, dry_run=False, exclude=(),
+                   backend=None, threads=8, on_result=None):
+    """Process all PDF files in the given folder (or a single PDF file) and optionally its subfolders.
+
+    on_result is called with a record (path, status, date) for every file
+    once it is done. Returns the number of updated, failed and already
+    correct files.
+    """
     try:
         folder = Path(folder_path)
         if not folder.exists():
             logger.error(f"Folder not found: {folder_path}")
-            return 0, 0
-            
-        # Get all PDF files
-        if recursive:
-            pdf_files = list(folder.glob('**/*.pdf'))
-        else:
-            pdf_files = list(folder.glob('*.pdf'))
-            
-        if not pdf_files:
-            logger.info(f"No PDF files found in {folder_path}")
-            return 0, 0
-            
+            return 0, 0, 0
+
+        backend = backend or resolve_backend(modified_date=modify_modified_date)
+        # Files are processed while a background thread is still discovering them
+        pdf_files = PdfDiscovery(folder, recursive, exclude)
+
         success_count = 0
         fail_count = 0
-        
-        # Use tqdm for progress bar
-        for pdf_file in tqdm(pdf_files, desc=f"Processing {folder_path}"):
-            success = update_file_creation_date(pdf_file, dry_run)
-            if success:
+        unchanged_count = 0
+        in_flight = deque()
+        pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 and backend.thread_safe else None
+        directories = DirectoryHandles() if backend.uses_dir_fd else None
+
+        def report(pdf_file, status, date_time):
+            if on_result is not None:
+                on_result({'path': pdf_file, 'status': status,
+                           'date': date_time.strftime('%Y-%m-%d') if date_time else None})
+
+        def collect(pending):
+            nonlocal success_count, fail_count
+            future, pdf_file, date_time = pending
+            if future.result():
                 success_count += 1
+                report(pdf_file, UPDATED, date_time)
             else:
                 fail_count += 1
-                
-        return success_count, fail_count
-        
+                report(pdf_file, FAILED, date_time)
+
+        try:
+            # Use tqdm for progress bar, its total grows with the files found so far
+            with tqdm(pdf_files, desc=f"Processing {folder_path}", total=0) as progress:
+                for pdf_file in progress:
+                    if progress.total != pdf_files.discovered:
+                        progress.total = pdf_files.discovered
+                        progress.refresh()
+
+                    dir_fd = None
+                    if directories is not None:
+                        if directories.full:
+                            # Pending writes may still use the open folders
+                            while in_flight:
+                                collect(in_flight.popleft())
+                            directories.close()
+                        try:
+                            dir_fd = directories.get(pdf_file)
+                        except OSError:
+                            pass
+
+                    # Only files whose timestamps differ are written
+                    date_time, status, stat = inspect_file(pdf_file, backend, dir_fd)
+                    if status == FAILED:
+                        fail_count += 1
+                        report(pdf_file, FAILED, date_time)
+                    elif status == UNCHANGED:
+                        unchanged_count += 1
+                        report(pdf_file, UNCHANGED, date_time)
+                    elif dry_run:
+                        logger.info(f"Would set creation date of {os.path.basename(pdf_file)} "
+                                    f"to {date_time.strftime('%Y-%m-%d')}")
+                        success_count += 1
+                        report(pdf_file, 'would_update', date_time)
+                    elif pool is None:
+                        if write_timestamp(pdf_file, date_time, backend, stat, dir_fd):
+                            success_count += 1
+                            report(pdf_file, UPDATED, date_time)
+                        else:
+                            fail_count += 1
+                            report(pdf_file, FAILED, date_time)
+                    else:
+                        in_flight.append((
+                            pool.submit(write_timestamp, pdf_file, date_time, backend, stat, dir_fd),
+                            pdf_file,
+                            date_time
+                        ))
+                        # Bounded, so a huge tree does not queue up every write
+                        if len(in_flight) >= threads * 4:
+                            collect(in_flight.popleft())
+            while in_flight:
+                collect(in_flight.popleft())
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if directories is not None:
+                directories.close()
+
+        if not pdf_files.discovered:
+            logger.info(f"No PDF files found in {folder_path}")
+
+        return success_count, fail_count, unchanged_count
+
     except PermissionError:
         logger.error(f"Permission denied accessing folder: {folder_path}")
-        return 0, 0
+        return 0, 0, 0
     except Exception as e:
         logger.error(f"Error processing folder {folder_path}: {str(e)}")
-        return 0, 0
+        return 0, 0, 0
+
+# Options a --batch job may set for itself
+BATCH_OPTIONS = {'recursive': bool, 'exclude': list}
+
+def run_batch(args, backend):
+    """Process the jobs of args.batch without prompting and return the exit code.
+
+    Writes one JSON line per file to args.results as soon as it is done and a
+    summary line at the end. The exit code is 1 when a file or job failed,
+    2 when the jobs could not be read.
+    """
+    try:
+        writer = ResultWriter(args.results, failed_statuses=(FAILED, 'error'))
+    except OSError as e:
+        logger.error(f"Cannot write results to {args.results}: {e}")
+        return EXIT_USAGE
+
+    try:
+        for number, job, error in iter_jobs(args.batch, 'path', BATCH_OPTIONS):
+            if error is not None:
+                logger.error(f"Job {number}: {error}")
+                writer.write({'job': number, 'status': 'error', 'error': error})
+                continue
+            path = job['path']
+            if not os.path.exists(path):
+                logger.error(f"Job {number}: {path} not found")
+                writer.write({'job': number, 'path': path, 'status': 'error', 'error': 'Path not found'})
+                continue
+            try:
+                process_folder(
+                    path,
+                    recursive=job.get('recursive', args.recursive),
+                    modify_modified_date=args.modified_date,
+                    dry_run=args.dry_run,
+                    exclude=job.get('exclude', args.exclude),
+                    backend=backend,
+                    threads=args.threads,
+                    on_result=lambda record: writer.write({'job': number, **record})
+                )
+            except Exception as e:
+                logger.error(f"Job {number}: error processing {path}: {e}")
+                writer.write({'job': number, 'path': path, 'status': 'error', 'error': str(e)})
+    except OSError as e:
+        logger.error(f"Cannot read jobs from {args.batch}: {e}")
+        writer.close()
+        return EXIT_USAGE
+    return writer.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Update PDF file creation dates based on filename patterns')
-    parser.add_argument('folders', nargs='*', help='Folders to process (optional, can input during execution)')
+    parser.add_argument('folders', nargs='*', help='Folders to process (prompted for when none are given)')
     parser.add_argument('-r', '--recursive', action='store_true', help='Process subfolders recursively')
-    parser.add_argument('-m', '--modified-date', action='store_true', help='Also update modified date')
+    parser.add_argument('-m', '--modified-date', action='store_true',
+                        help='Also update modified date (birthtime backend only, the mtime and atime-mtime '
+                             'backends always write it)')
+    parser.add_argument('-b', '--backend', choices=['auto', *BACKENDS], default='auto',
+                        help='Timestamps to write: birthtime (creation date, macOS and Windows), mtime, '
+                             'atime-mtime, or fake to only log the writes (default: auto, birthtime where '
+                             'supported, otherwise mtime)')
     parser.add_argument('-d', '--dry-run', action='store_true', help="Don't make changes, just preview")
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose logging')
+    parser.add_argument('-x', '--exclude', action='append', default=[], metavar='PATTERN',
+                        help='Skip files and folders matching this glob pattern (can be repeated)')
+    parser.add_argument('-t', '--threads', type=int, default=8,
+                        help='Number of threads writing timestamps (default: 8)')
+    parser.add_argument('--batch', metavar='JOBS',
+                        help="Process the folders or files listed in this file ('-' for stdin) without prompting; "
+                             'a line is a path or a JSON object with "path" and optionally "recursive" and "exclude"')
+    parser.add_argument('--results', default='-', metavar='PATH',
+                        help='Append the JSON line results of --batch to this file (default: stdout)')
     
     args = parser.parse_args()
     
     if args.verbose:
         logger.setLevel(logging.DEBUG)
     
+    # Resolved once for all folders
+    try:
+        backend = resolve_backend(args.backend, args.modified_date)
+    except ValueError as e:
+        logger.error(str(e))
+        raise SystemExit(1)
+    if args.modified_date and not isinstance(backend, BirthtimeBackend):
+        logger.info(f"The {backend.name} backend always writes the modified date, -m changes nothing")
+    
+    # In batch mode stdout only carries the results
+    if args.batch:
+        raise SystemExit(run_batch(args, backend))
+    
     print("\nEdit Creation Date Tool (Improved)\n")
     print("===============")
-    print("Type 'exit' to quit the program.")
+    if not args.folders:
+        print("Type 'exit' to quit the program.")
     print("===============\n")
     
     if args.dry_run:
@@ -139,38 +498,48 @@ def main():
     
     total_processed = 0
     total_failed = 0
+    total_unchanged = 0
     
     # Process folders from command line arguments
     if args.folders:
         for folder in args.folders:
-            success, failed = process_folder(
+            success, failed, unchanged = process_folder(
                 folder, 
                 recursive=args.recursive,
                 modify_modified_date=args.modified_date,
-                dry_run=args.dry_run
-            )
-            total_processed += success
-            total_failed += failed
-    
-    # Interactive mode
-    folder_path = input("Folder path (or 'exit' to quit): ")
-    
-    while folder_path.lower() != 'exit':
-        if folder_path.strip():
-            success, failed = process_folder(
-                folder_path, 
-                recursive=args.recursive,
-                modify_modified_date=args.modified_date,
-                dry_run=args.dry_run
+                dry_run=args.dry_run,
+                exclude=args.exclude,
+                backend=backend,
+                threads=args.threads
             )
             total_processed += success
             total_failed += failed
-            
-            print(f"Files processed: {success}, Failed: {failed}\n")
-            
+            total_unchanged += unchanged
+    else:
+        # Interactive mode, only when no folders were given
         folder_path = input("Folder path (or 'exit' to quit): ")
+        
+        while folder_path.lower() != 'exit':
+            if folder_path.strip():
+                success, failed, unchanged = process_folder(
+                    folder_path, 
+                    recursive=args.recursive,
+                    modify_modified_date=args.modified_date,
+                    dry_run=args.dry_run,
+                    exclude=args.exclude,
+                    backend=backend,
+                    threads=args.threads
+                )
+                total_processed += success
+                total_failed += failed
+                total_unchanged += unchanged
+                
+                print(f"Files processed: {success}, Already correct: {unchanged}, Failed: {failed}\n")
+                
+            folder_path = input("Folder path (or 'exit' to quit): ")
     
-    print(f"\nSummary: Total files processed: {total_processed}, Failed: {total_failed}")
+    print(f"\nSummary: Total files processed: {total_processed}, Already correct: {total_unchanged}, "
+          f"Failed: {total_failed}")
     print("Program completed.")
 
 if __name__ == '__main__':
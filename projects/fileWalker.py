@@ -0,0 +1,109 @@
+import os
+import queue
+import fnmatch
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def is_excluded(path, name, exclude):
+    """Check a file or folder against glob patterns matched on its name or full path."""
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern) for pattern in exclude)
+
+
+def iter_pdf_files(folder, recursive=False, exclude=()):
+    """Yield the paths of PDF files in folder as they are found.
+
+    Uses os.scandir, so file types come from the directory listing without an
+    extra stat per entry. Matching of the .pdf extension is case-insensitive and
+    symlinked folders are not followed. A single PDF file can be passed
+    instead of a folder.
+    """
+    folder = os.fspath(folder)
+    if os.path.isfile(folder):
+        if folder.lower().endswith('.pdf'):
+            yield folder
+        return
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        subfolders = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if exclude and is_excluded(entry.path, entry.name, exclude):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                subfolders.append(entry.path)
+                        elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                            yield entry.path
+                    except OSError as e:
+                        logger.warning(f"Skipping {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"Cannot read folder {current}: {e}")
+        # Depth first, in listing order
+        stack.extend(reversed(subfolders))
+
+
+class PdfDiscovery:
+    """Iterate over PDF files while a background thread is still discovering them.
+
+    The walker fills a bounded queue, so processing starts with the first file
+    found and memory stays flat on huge trees. `discovered` is the running
+    total and `finished` tells whether it is final.
+    """
+
+    def __init__(self, folder, recursive=False, exclude=(), maxsize=1000):
+        self.folder = folder
+        self.discovered = 0
+        self.finished = False
+        self._queue = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._walk, args=(folder, recursive, exclude), name='pdf-discovery', daemon=True
+        )
+        self._thread.start()
+
+    def _walk(self, folder, recursive, exclude):
+        try:
+            for path in iter_pdf_files(folder, recursive, exclude):
+                self.discovered += 1
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put(path, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if self._stop.is_set():
+                    return
+        finally:
+            self.finished = True
+            self._queue.put(_DONE)
+
+    def progress(self, done):
+        """Format `done` against the running total, e.g. '12/40' or '12/40+' while still counting."""
+        return f"{done}/{self.discovered}" if self.finished else f"{done}/{self.discovered}+"
+
+    def close(self):
+        self._stop.set()
+        # Unblock the walker if it waits for room in the queue
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def __iter__(self):
+        try:
+            while True:
+                path = self._queue.get()
+                if path is _DONE:
+                    return
+                yield path
+        finally:
+            self.close()
@@ -1,59 +1,175 @@
 import os
 import re
-import pdfplumber
-import dateparser
+import sys
 import logging
 import argparse
+import contextlib
+import hashlib
+import heapq
+import json
+import signal
+import socket
+import socketserver
+import sqlite3
+import stat
+import time
+import datetime
+import functools
+import itertools
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from xml.etree import ElementTree
 
+from fileWalker import PdfDiscovery, iter_pdf_files
+from batchJobs import EXIT_USAGE, ResultWriter, iter_jobs
 
-def extract_date(text, filename=None):
-    patterns = [
-        # Ort, Datum
-        r'(?:Ort\s*,\s*D[au]tum)\s*[:\-]?\s*(\d{1,2}\.\s*[A-Za-zäÄöÖüÜß]+\s*\d{4}|\d{1,2}\.\d{1,2}\.\d{4})',
-        # Datum
-        r'(?:D[au]tum\s*,\s*Ort)\s*[:\-]?\s*(\d{1,2}\.\s*[A-Za-zäÄöÖüÜß]+\s*\d{4}|\d{1,2}\.\d{1,2}\.\d{4})',
-        # Unterschriftenfeld mit Datum
-        r'(?:Unterschrift(?:en)?)\s*[:\-]?\s*(\d{1,2}\.\s*[A-Za-zäÄöÖüÜß]+\s*\d{4}|\d{1,2}\.\d{1,2}\.\d{4})',
-        # DD.MM.YYYY
-        r'\b(\d{1,2}\.\d{1,2}\.\d{4})\b',
-        # DD. Month YYYY
-        r'\b(\d{1,2}\.\s*[A-Za-zäÄöÖüÜß]+\s*\d{4})\b',
-        # YYYY-MM-DD
-        r'\b(\d{4}-\d{1,2}-\d{1,2})\b',
-        # DD/MM/YYYY
-        r'\b(\d{1,2}/\d{1,2}/\d{4})\b',
-    ]
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
+
+class StageTimer:
+    """Adds up wall-clock time per named stage while processing one file."""
+
+    def __init__(self):
+        self.durations = {}
+
+    def stage(self, name):
+        return _TimedStage(self.durations, name)
+
+
+class _TimedStage:
+    __slots__ = ('durations', 'name', 'start')
+
+    def __init__(self, durations, name):
+        self.durations = durations
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.durations[self.name] = self.durations.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class _NullTimer:
+    """Stand-in when profiling is off: every stage is the same no-op context."""
+
+    durations = None
+    _context = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+
+NULL_TIMER = _NullTimer()
+
+
+DATE_PATTERNS = [
+    # Ort, Datum
+    r'(?:Ort\s*,\s*D[au]tum)\s*[:\-]?\s*(\d{1,2}\.\s*[A-Za-zäÄöÖüÜß]+\s*\d{4}|\d{1,2}\.\d{1,2}\.\d{4})',
+    # Datum
+    r'(?:D[au]tum\s*,\s*Ort)\s*[:\-]?\s*(\d{1,2}\.\s*[A-Za-zäÄöÖüÜß]+\s*\d{4}|\d{1,2}\.\d{1,2}\.\d{4})',
+    # Unterschriftenfeld mit Datum
+    r'(?:Unterschrift(?:en)?)\s*[:\-]?\s*(\d{1,2}\.\s*[A-Za-zäÄöÖüÜß]+\s*\d{4}|\d{1,2}\.\d{1,2}\.\d{4})',
+    # DD.MM.YYYY
+    r'\b(\d{1,2}\.\d{1,2}\.\d{4})\b',
+    # DD. Month YYYY
+    r'\b(\d{1,2}\.\s*[A-Za-zäÄöÖüÜß]+\s*\d{4})\b',
+    # YYYY-MM-DD
+    r'\b(\d{4}-\d{1,2}-\d{1,2})\b',
+    # DD/MM/YYYY
+    r'\b(\d{1,2}/\d{1,2}/\d{4})\b',
+]
+
+# All date patterns in one scanner. Each pattern sits in its own lookahead, so at
+# every position the highest priority pattern that matches there is reported and
+# its capture group number tells which one it was. The first report of the best
+# pattern is its leftmost match, the same one re.findall() returned first.
+DATE_SCANNER = re.compile('|'.join(f'(?={pattern})' for pattern in DATE_PATTERNS), re.IGNORECASE)
+
+FILENAME_DATE_PREFIX = re.compile(r'^(\d{8})_')
+FILENAME_DATE_PATTERNS = [
+    # YYYY-MM-DD
+    re.compile(r'(\d{4}-\d{2}-\d{2})'),
+    # DD.MM.YYYY
+    re.compile(r'(\d{2}\.\d{2}\.\d{4})'),
+]
+
+# Purely numeric dates are parsed directly, dateparser is only needed for month names
+NUMERIC_DATES = [
+    (re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})'), ('day', 'month', 'year')),
+    (re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})'), ('year', 'month', 'day')),
+    (re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})'), ('day', 'month', 'year')),
+]
+
+
+@functools.lru_cache(maxsize=4096)
+def _dateparser_parse(date_str, languages=None):
+    # Imported on first use, it is the slowest import of this script
+    import dateparser
+    return dateparser.parse(date_str, languages=list(languages) if languages else None)
+
+
+def parse_date(date_str, languages=('de',)):
+    for pattern, fields in NUMERIC_DATES:
+        if fields[0] == 'day' and 'de' not in (languages or ()):
+            # Without German as language dateparser reads these month first
+            continue
+        match = pattern.fullmatch(date_str)
+        if match:
+            parts = dict(zip(fields, map(int, match.groups())))
+            try:
+                return datetime.datetime(parts['year'], parts['month'], parts['day'])
+            except ValueError:
+                # Let dateparser decide what it makes of impossible dates
+                break
+    return _dateparser_parse(date_str, tuple(languages) if languages else None)
+
+
+def find_date_string(text):
+    best_index = None
+    best_match = None
+    for match in DATE_SCANNER.finditer(text):
+        index = match.lastindex - 1
+        if best_index is None or index < best_index:
+            best_index = index
+            best_match = match.group(match.lastindex)
+            if index == 0:
+                break
+    return best_match
+
+
+def extract_date(text, filename=None, timer=NULL_TIMER):
     # Try to find date in text
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            if isinstance(matches[0], tuple):  # für die ersten drei Muster
-                return dateparser.parse(matches[0][0], languages=['de'])
-            else:  # für die letzten vier Muster
-                return dateparser.parse(matches[0], languages=['de'])
+    with timer.stage('date_regex'):
+        date_str = find_date_string(text)
+    if date_str is not None:
+        with timer.stage('date_parse'):
+            return parse_date(date_str, languages=('de',))
 
     # Fallback: Try to extract date from filename
     if filename:
+        basename = os.path.basename(filename)
+
         # Try to find YYYYMMDD at start of filename
-        filename_match = re.search(r'^(\d{8})_', os.path.basename(filename))
+        filename_match = FILENAME_DATE_PREFIX.search(basename)
         if filename_match:
             date_str = filename_match.group(1)
-            return dateparser.parse(f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}")
+            return parse_date(f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}", languages=None)
         
         # Try other date formats in filename
-        date_patterns = [
-            # YYYY-MM-DD
-            r'(\d{4}-\d{2}-\d{2})',
-            # DD.MM.YYYY
-            r'(\d{2}\.\d{2}\.\d{4})',
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, os.path.basename(filename))
+        for pattern in FILENAME_DATE_PATTERNS:
+            match = pattern.search(basename)
             if match:
-                return dateparser.parse(match.group(1))
+                return parse_date(match.group(1), languages=None)
 
     return None
 
@@ -71,47 +187,508 @@ def load_keywords_from_file(filename):
         return []
 
 
+# Characters that make a keyword behave differently in the unescaped fallback pattern
+_REGEX_SPECIAL_CHARS = set('.^$*+?{}[]\\|()')
+
+
+def _fold_case(text):
+    # Per-character lowercase that keeps the length, so folded matches map back to keywords
+    return ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+
+def _trie_regex(node):
+    branches = [re.escape(char) + _trie_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # Greedy optional: prefer the longer keyword, fall back to the one ending here
+        body = '(?:' + body + ')?'
+    return body
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _prefix_word_starts(text, end):
+    # All positions a where text[a:end] matches one prefix word of the title
+    # pattern, i.e. [\w\d][^\n\r.]{0,30}\s+
+    if end < 2 or not text[end - 1].isspace():
+        return []
+    space_start = end - 1
+    while space_start > 0 and text[space_start - 1].isspace():
+        space_start -= 1
+
+    starts = []
+    for start in range(end - 2, max(space_start - 32, -1), -1):
+        if start + 1 < space_start and text[start + 1] in '\n\r.':
+            break
+        if _is_word_char(text[start]):
+            starts.append(start)
+    return starts
+
+
+def _format_title(title):
+    # Clean up the title: remove excess whitespace and truncate if too long
+    title = title.strip()
+
+    # Handle titles that are too long (cap at 80 chars)
+    if len(title) > 80:
+        # Try to find a natural break point
+        last_space = title[:80].rfind(' ')
+        if last_space > 40:  # Only truncate if we have a reasonable title length
+            title = title[:last_space]
+
+    # Replace problematic characters and multiple spaces
+    title = re.sub(r'\s+', ' ', title)  # Replace multiple spaces with single space
+    title = title.replace('/', '_').replace('\\', '_')
+    title = title.replace(':', '_').replace(';', '_')
+    title = title.replace('"', '').replace("'", "")
+    title = title.replace(' ', '_')
+    return title
+
+
+class KeywordIndex:
+    """Keywords compiled once into a single scanner for title extraction.
+
+    The result is the same as trying every keyword longest first: the scanner
+    reports the longest keyword starting at each position of the text, and the
+    best ranked one over all positions is the keyword the old loop would have
+    stopped at. Only that keyword's title pattern is then run.
+    """
+
+    def __init__(self, keywords):
+        # Sort keywords by length (longest first) to prioritize more specific matches;
+        # sorted() is stable, so keywords of equal length keep their file order
+        self.keywords = sorted(keywords, key=len, reverse=True)
+        self._ranks = {}
+        self._regex_fallbacks = []
+        self._empty_rank = None
+        self._title_patterns = {}
+        self._keyword_patterns = {}
+
+        trie = {}
+        for rank, keyword in enumerate(self.keywords):
+            if not keyword:
+                if self._empty_rank is None:
+                    self._empty_rank = rank
+                continue
+            folded = _fold_case(keyword)
+            self._ranks.setdefault(folded, rank)
+            node = trie
+            for char in folded:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+            if _REGEX_SPECIAL_CHARS.intersection(keyword):
+                # The simple fallback pattern uses the keyword unescaped, so it can
+                # match even where the literal keyword does not appear
+                try:
+                    pattern = re.compile(r"\b{}\w*\b".format(keyword), re.IGNORECASE)
+                except re.error as e:
+                    logging.warning(f"Ignoring invalid keyword pattern {keyword!r}: {e}")
+                    continue
+                self._regex_fallbacks.append((rank, pattern))
+
+        self._scanner = re.compile('(?=(' + _trie_regex(trie) + '))', re.IGNORECASE) if trie else None
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def _rank_of(self, matched):
+        rank = self._ranks.get(_fold_case(matched))
+        if rank is None:
+            # Case folding that is not one-to-one, resolve it the slow way
+            for rank, keyword in enumerate(self.keywords):
+                if keyword and re.fullmatch(re.escape(keyword), matched, re.IGNORECASE):
+                    break
+        return rank
+
+    def best_keyword_rank(self, text):
+        if self._scanner is None:
+            return None
+        best = None
+        for match in self._scanner.finditer(text):
+            rank = self._rank_of(match.group(1))
+            if best is None or rank < best:
+                best = rank
+                if best == 0:
+                    break
+        return best
+
+    def _title_pattern(self, rank):
+        pattern = self._title_patterns.get(rank)
+        if pattern is None:
+            # Look for up to 5 words before and after the keyword
+            pattern = re.compile(
+                r'(?:[\w\d][^\n\r.]{0,30}\s+){0,5}' + re.escape(self.keywords[rank]) + r'(?:\s+[^\n\r.]{0,30}[\w\d]){0,5}',
+                re.IGNORECASE
+            )
+            self._title_patterns[rank] = pattern
+        return pattern
+
+    def find_title(self, text):
+        """Return the title for text, or None if no keyword matches."""
+        best = self.best_keyword_rank(text)
+
+        # Keywords ranked before the best literal match only had a chance through
+        # the simple pattern, which differs from the literal for regex keywords
+        for rank, pattern in self._regex_fallbacks:
+            if best is not None and rank >= best:
+                break
+            simple_match = pattern.search(text)
+            if simple_match:
+                return simple_match.group(0).replace(" ", "_")
+
+        if best is None:
+            best = self._empty_rank
+            if best is None:
+                return None
+
+        title_match = self._title_pattern(best).match(text, self._title_start(text, best))
+        return _format_title(title_match.group(0))
+
+    def _title_start(self, text, rank):
+        # re.search() would try the title pattern at every position and backtrack
+        # through all ways of splitting the words in front of it, which explodes on
+        # long lines. Instead walk back from each occurrence of the keyword over at
+        # most 5 prefix words and anchor the pattern at the leftmost reachable start.
+        keyword_pattern = self._keyword_patterns.get(rank)
+        if keyword_pattern is None:
+            keyword_pattern = re.compile('(?=' + re.escape(self.keywords[rank]) + ')', re.IGNORECASE)
+            self._keyword_patterns[rank] = keyword_pattern
+
+        start = None
+        for occurrence in keyword_pattern.finditer(text):
+            ends = {occurrence.start()}
+            reachable = set(ends)
+            for _ in range(5):
+                ends = {word_start for end in ends for word_start in _prefix_word_starts(text, end)}
+                reachable |= ends
+            if start is None or min(reachable) < start:
+                start = min(reachable)
+        return start
+
+
+@functools.lru_cache(maxsize=8)
+def load_keyword_index(keywords_file):
+    return KeywordIndex(load_keywords_from_file(keywords_file))
+
+
 def extract_title(text, keywords_file):
-    keywords = load_keywords_from_file(keywords_file)
-    if not keywords:
+    index = load_keyword_index(keywords_file)
+    if not index:
         return "Unknown"
-    
-    # Sort keywords by length (longest first) to prioritize more specific matches
-    sorted_keywords = sorted(keywords, key=len, reverse=True)
-    
-    for keyword in sorted_keywords:
-        # First try to find a complete title with numbers and special characters
-        # Look for up to 5 words before and after the keyword
-        title_pattern = r'(?:[\w\d][^\n\r.]{0,30}\s+){0,5}' + re.escape(keyword) + r'(?:\s+[^\n\r.]{0,30}[\w\d]){0,5}'
-        title_match = re.search(title_pattern, text, re.IGNORECASE)
-        
-        if title_match:
-            # Clean up the title: remove excess whitespace and truncate if too long
-            title = title_match.group(0).strip()
-            
-            # Handle titles that are too long (cap at 80 chars)
-            if len(title) > 80:
-                # Try to find a natural break point
-                last_space = title[:80].rfind(' ')
-                if last_space > 40:  # Only truncate if we have a reasonable title length
-                    title = title[:last_space]
-            
-            # Replace problematic characters and multiple spaces
-            title = re.sub(r'\s+', ' ', title)  # Replace multiple spaces with single space
-            title = title.replace('/', '_').replace('\\', '_')
-            title = title.replace(':', '_').replace(';', '_')
-            title = title.replace('"', '').replace("'", "")
-            title = title.replace(' ', '_')
-            
-            return title
-        
-        # Fallback to the original simple pattern if the complex one doesn't match
-        simple_pattern = r"\b{}\w*\b".format(keyword)
-        simple_match = re.search(simple_pattern, text, re.IGNORECASE)
-        if simple_match:
-            return simple_match.group(0).replace(" ", "_")
-            
-    return "Unknown"
+    title = index.find_title(text)
+    return "Unknown" if title is None else title
+
+
+MAX_PAGES = 3
+
+CACHE_SCHEMA_VERSION = 2
+
+
+class ExtractionCache:
+    """SQLite cache of extracted dates and titles, so unchanged PDFs are not parsed again.
+
+    Entries are keyed on (device, inode, size, mtime), which survives renames.
+    With use_content_hash a SHA-256 of the file content is stored as well and
+    used when the stat key misses, e.g. for copies or files touched by other
+    tools.
+    The whole cache is dropped when the keywords file or the extraction
+    settings change. It may be shared between threads, e.g. the request
+    handlers of serve().
+    """
+
+    def __init__(self, db_path, keywords_file, max_entries=100000, use_content_hash=False, settings=''):
+        self.max_entries = max_entries
+        self.use_content_hash = use_content_hash
+        self.hits = 0
+        self.misses = 0
+        self._pending_writes = 0
+        # Content hashes computed by lookup() misses, reused by store()
+        self._miss_hashes = {}
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Caches of schema version 1 lack the device column; the version change drops their entries anyway
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(extractions)")]
+        if columns and 'dev' not in columns:
+            self.conn.execute("DROP TABLE extractions")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS extractions (
+                dev INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER,
+                content_hash TEXT, date TEXT, title TEXT, text_digest TEXT,
+                last_used REAL,
+                PRIMARY KEY (dev, inode, size, mtime_ns)
+            );
+            CREATE INDEX IF NOT EXISTS extractions_content_hash ON extractions (content_hash);
+            CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used);
+        ''')
+        self._check_signature(keywords_file, settings)
+
+    def _check_signature(self, keywords_file, settings):
+        try:
+            with open(keywords_file, 'rb') as file:
+                keywords_digest = hashlib.sha256(file.read()).hexdigest()
+        except OSError:
+            keywords_digest = ''
+        signature = f"{CACHE_SCHEMA_VERSION}:{settings}:{keywords_digest}"
+
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        if row is None or row[0] != signature:
+            if row is not None:
+                logging.info("Keywords file or extraction settings changed, clearing extraction cache")
+            self.clear()
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?)", (signature,))
+            self.conn.commit()
+
+    @staticmethod
+    def _stat_key(pdf_path):
+        stat = os.stat(pdf_path)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def content_hash(pdf_path):
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def lookup(self, pdf_path, name_format="{date}_{title}"):
+        """Return a cached analysis result for pdf_path, or None on a miss."""
+        with self._lock:
+            return self._lookup(pdf_path, name_format)
+
+    def _lookup(self, pdf_path, name_format):
+        try:
+            key = self._stat_key(pdf_path)
+            row = self.conn.execute(
+                "SELECT date, title, text_digest, content_hash FROM extractions "
+                "WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ?", key
+            ).fetchone()
+            if row is None and self.use_content_hash:
+                content_hash = self.content_hash(pdf_path)
+                row = self.conn.execute(
+                    "SELECT date, title, text_digest, content_hash FROM extractions "
+                    "WHERE content_hash = ? LIMIT 1", (content_hash,)
+                ).fetchone()
+                if row is not None:
+                    # Remember the new identity so the next lookup is a stat hit
+                    self._write(key, row[0], row[1], row[2], row[3])
+                else:
+                    self._miss_hashes[pdf_path] = (key, content_hash)
+        except OSError:
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE extractions SET last_used = ? WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+            (time.time(), *key)
+        )
+        date = datetime.datetime.fromisoformat(row[0]) if row[0] else None
+        result = _analysis_result(pdf_path, date, row[1], name_format)
+        result['text_digest'] = row[2]
+        result['cached'] = True
+        if date is not None:
+            result['resolved_by'] = 'cache'
+        return result
+
+    def store(self, result):
+        hashed = self._miss_hashes.pop(result['path'], None)
+        if result['error'] is not None:
+            return
+        try:
+            key = self._stat_key(result['path'])
+            if not self.use_content_hash:
+                content_hash = None
+            elif hashed is not None and hashed[0] == key:
+                # Hashed by the lookup that missed, and the file is unchanged since
+                content_hash = hashed[1]
+            else:
+                content_hash = self.content_hash(result['path'])
+        except OSError:
+            return
+        date = result['date'].isoformat() if result['date'] else None
+        with self._lock:
+            self._write(key, date, result['title'], result.get('text_digest'), content_hash)
+
+    def _write(self, key, date, title, text_digest, content_hash):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO extractions "
+            "(dev, inode, size, mtime_ns, content_hash, date, title, text_digest, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (*key, content_hash, date, title, text_digest, time.time())
+        )
+        self._pending_writes += 1
+        if self._pending_writes >= 100:
+            self.conn.commit()
+            self._pending_writes = 0
+
+    def invalidate(self, pdf_path):
+        try:
+            key = self._stat_key(pdf_path)
+        except OSError:
+            return
+        with self._lock:
+            self.conn.execute("DELETE FROM extractions WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+                              key)
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM extractions")
+            self.conn.commit()
+
+    def evict(self):
+        # Keep the most recently used entries
+        with self._lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM extractions WHERE rowid IN "
+                    "(SELECT rowid FROM extractions ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                logging.debug(f"Evicted {count - self.max_entries} entries from extraction cache")
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+class DuplicateIndex:
+    """Content-hash index of the archive to find byte-identical PDFs before extraction.
+
+    Files are keyed on (device, inode), so renames and hard links do not
+    create new entries. Hashing is lazy: a file is only read when another
+    file has the same size, first as a hash of its head and tail and only
+    if that matches as a full SHA-256. Both hashes are kept as long as size
+    and mtime stay the same, so repeated runs over the archive read almost
+    nothing. Without db_path the index only lives for the current run.
+    """
+
+    PARTIAL_BYTES = 64 * 1024
+    DUPLICATE_POLICIES = ('report', 'skip', 'hardlink')
+
+    def __init__(self, db_path=None):
+        self.conn = sqlite3.connect(db_path or ':memory:')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                dev INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, path TEXT,
+                partial_hash TEXT, full_hash TEXT,
+                PRIMARY KEY (dev, inode)
+            );
+            CREATE INDEX IF NOT EXISTS files_size ON files (size);
+        ''')
+        self._pending_writes = 0
+
+    @classmethod
+    def partial_hash(cls, pdf_path, size):
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as file:
+            digest.update(file.read(cls.PARTIAL_BYTES))
+            if size > 2 * cls.PARTIAL_BYTES:
+                # The tail holds the cross-reference table and the document ID
+                file.seek(-cls.PARTIAL_BYTES, os.SEEK_END)
+            digest.update(file.read())
+        return digest.hexdigest()
+
+    def _is_current(self, dev, inode, path, size, mtime_ns):
+        # An entry is dropped once its file is gone, changed or moved by another tool
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns) != (dev, inode, size, mtime_ns):
+            self.conn.execute("DELETE FROM files WHERE dev = ? AND inode = ?", (dev, inode))
+            return False
+        return True
+
+    def _hash(self, column, dev, inode, path, size):
+        # Returns the stored hash or computes and stores it, None if the file cannot be read
+        row = self.conn.execute(f"SELECT {column} FROM files WHERE dev = ? AND inode = ?", (dev, inode)).fetchone()
+        if row is not None and row[0] is not None:
+            return row[0]
+        try:
+            value = self.partial_hash(path, size) if column == 'partial_hash' else ExtractionCache.content_hash(path)
+        except OSError:
+            return None
+        self.conn.execute(f"UPDATE files SET {column} = ? WHERE dev = ? AND inode = ?", (value, dev, inode))
+        return value
+
+    def check(self, pdf_path):
+        """Add pdf_path to the index and return the path of an identical, already indexed file, or None."""
+        stat = os.stat(pdf_path)
+        key = (stat.st_dev, stat.st_ino)
+        row = self.conn.execute("SELECT size, mtime_ns FROM files WHERE dev = ? AND inode = ?", key).fetchone()
+        if row is None or row != (stat.st_size, stat.st_mtime_ns):
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (dev, inode, size, mtime_ns, path) VALUES (?, ?, ?, ?, ?)",
+                (*key, stat.st_size, stat.st_mtime_ns, pdf_path)
+            )
+        else:
+            self.conn.execute("UPDATE files SET path = ? WHERE dev = ? AND inode = ?", (pdf_path, *key))
+        self._pending_writes += 1
+        if self._pending_writes >= 100:
+            self.conn.commit()
+            self._pending_writes = 0
+
+        # Only files indexed before this one count as originals
+        rowid = self.conn.execute("SELECT rowid FROM files WHERE dev = ? AND inode = ?", key).fetchone()[0]
+        candidates = self.conn.execute(
+            "SELECT dev, inode, path, mtime_ns FROM files WHERE size = ? AND rowid < ? ORDER BY rowid",
+            (stat.st_size, rowid)
+        ).fetchall()
+        if not candidates:
+            return None
+
+        own = (*key, pdf_path, stat.st_size)
+        partial = self._hash('partial_hash', *own)
+        for dev, inode, path, mtime_ns in candidates:
+            if partial is None or not self._is_current(dev, inode, path, stat.st_size, mtime_ns):
+                continue
+            other = (dev, inode, path, stat.st_size)
+            if self._hash('partial_hash', *other) != partial:
+                continue
+            full = self._hash('full_hash', *own)
+            if full is not None and self._hash('full_hash', *other) == full:
+                return path
+        return None
+
+    def moved(self, old_path, new_path):
+        self.conn.execute("UPDATE files SET path = ? WHERE path = ?", (new_path, old_path))
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def hardlink_duplicate(pdf_path, original, dry_run=False):
+    """Replace pdf_path by a hard link to original. Returns True if it was (or would be) linked."""
+    if dry_run:
+        logging.info(f"Would hard-link duplicate {pdf_path} to {original}")
+        return True
+    temp_path = f"{pdf_path}.link-tmp"
+    try:
+        os.link(original, temp_path)
+        # Atomic, so pdf_path always exists with the same content
+        os.replace(temp_path, pdf_path)
+    except OSError as e:
+        logging.error(f"Error hard-linking {pdf_path} to {original}: {e}")
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        return False
+    logging.info(f"Hard-linked duplicate {pdf_path} to {original}")
+    return True
 
 
 def rename_pdf(pdf_path, new_name, dry_run=False):
@@ -142,50 +719,1130 @@ def rename_pdf(pdf_path, new_name, dry_run=False):
         return pdf_path
 
 
-def process_pdf(pdf_path, keywords_file, name_format="{date}_{title}", dry_run=False):
+COUNTER_SUFFIX = re.compile(r'^(.*)_(\d+)(\.[^.]*)$')
+
+
+class DateStamper:
+    """Writes the extracted date to a file's timestamps with the backends of editCreationDate.
+
+    Lets one run rename a file and set its dates, instead of a second tool
+    walking the tree again and parsing the new names.
+    """
+
+    def __init__(self, backend='auto', dry_run=False):
+        # Only needed in this mode
+        import editCreationDate
+        self._tool = editCreationDate
+        self.backend = editCreationDate.resolve_backend(backend)
+        self.dry_run = dry_run
+        self.counts = {}
+
+    def __call__(self, pdf_path, date):
+        # Midnight of the extracted day, as editCreationDate reads it from the new name
+        date_time = datetime.datetime(date.year, date.month, date.day)
+        status = self._tool.set_file_date(pdf_path, date_time, self.dry_run, self.backend)
+        self.counts[status] = self.counts.get(status, 0) + 1
+        return status
+
+    def summary(self):
+        tool = self._tool
+        return (f"{self.counts.get(tool.UPDATED, 0)} updated, {self.counts.get(tool.UNCHANGED, 0)} already correct, "
+                f"{self.counts.get(tool.FAILED, 0)} failed")
+
+
+class RenamePlanner:
+    """Plans collision-free renames from one directory listing per folder.
+
+    Target names are assigned like rename_pdf does (first free name of
+    name, name_1, name_2, ...), but against an in-memory index instead of
+    probing the disk, so many files resolving to the same name stay linear.
+    apply() performs the planned renames as one batch and appends each
+    completed rename to the journal, which undo_journal() can roll back.
+    With a stamper, every renamed file also gets its date written right
+    after the rename.
+    """
+
+    def __init__(self, dry_run=False, journal_path=None, profile=False, stamper=None):
+        self.dry_run = dry_run
+        self.journal_path = journal_path
+        self.profile = profile
+        self.stamper = stamper
+        # Seconds spent renaming each source path, filled by apply() when profiling
+        self.durations = {}
+        # (old path, new path) of the renames done by the last apply()
+        self.completed = []
+        self.run_id = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        self.planned = []
+        self._names = {}
+        self._next_counter = {}
+
+    def _folder_names(self, folder):
+        names = self._names.get(folder)
+        if names is None:
+            try:
+                names = {os.path.normcase(name) for name in os.listdir(folder or '.')}
+            except OSError:
+                names = set()
+            self._names[folder] = names
+        return names
+
+    def _release(self, folder, name):
+        names = self._folder_names(folder)
+        names.discard(os.path.normcase(name))
+        # A freed name_N lets later files of the same name use that counter again
+        match = COUNTER_SUFFIX.match(name)
+        if match and str(int(match.group(2))) == match.group(2):
+            key = (folder, match.group(1) + match.group(3))
+            counter = int(match.group(2))
+            if self._next_counter.get(key, 1) > counter:
+                self._next_counter[key] = counter
+
+    def assign(self, pdf_path, new_name, date=None):
+        """Reserve a free target name for pdf_path and return the planned path.
+
+        Returns pdf_path itself, and plans nothing, if the file already has
+        the name it would get.
+        """
+        folder = os.path.dirname(pdf_path)
+        names = self._folder_names(folder)
+        own_name = os.path.normcase(os.path.basename(pdf_path))
+
+        # Check if target file already exists
+        base, extension = os.path.splitext(new_name)
+        key = (folder, new_name)
+        counter = self._next_counter.get(key, 1)
+        candidate = new_name
+        own_match = COUNTER_SUFFIX.match(os.path.basename(pdf_path))
+        if (own_match and own_match.group(1) + own_match.group(3) == new_name
+                and str(int(own_match.group(2))) == own_match.group(2) and int(own_match.group(2)) < counter
+                and os.path.normcase(new_name) in names):
+            # The file already holds one of the skipped counter names, keep it
+            candidate = os.path.basename(pdf_path)
+        while os.path.normcase(candidate) in names and os.path.normcase(candidate) != own_name:
+            candidate = f"{base}_{counter}{extension}"
+            counter += 1
+        if candidate != new_name:
+            self._next_counter[key] = counter
+
+        new_pdf_path = os.path.join(folder, candidate)
+        if new_pdf_path == pdf_path:
+            # Already holds a counter name of its target, e.g. X_1.pdf next to X.pdf
+            logging.info(f"File already has correct name: {pdf_path}")
+            if self.stamper is not None and date is not None:
+                self.stamper(pdf_path, date)
+            return pdf_path
+        self._release(folder, os.path.basename(pdf_path))
+        names.add(os.path.normcase(candidate))
+        self.planned.append((pdf_path, new_pdf_path, date))
+        return new_pdf_path
+
+    def apply(self, on_applied=None):
+        """Perform all planned renames in order and return the number of renamed files.
+
+        on_applied is called with the old path, the new path and an error
+        message (None on success) right after each rename.
+        """
+        planned, self.planned = self.planned, []
+        if self.dry_run:
+            for pdf_path, new_pdf_path, date in planned:
+                logging.info(f"Would rename: {pdf_path} -> {new_pdf_path}")
+                if self.stamper is not None and date is not None:
+                    # The file still has its old name
+                    self.stamper(pdf_path, date)
+                if on_applied is not None:
+                    on_applied(pdf_path, new_pdf_path, None)
+            return 0
+
+        renamed = 0
+        self.completed = []
+        journal = open(self.journal_path, 'a', encoding='utf-8') if self.journal_path else None
+        try:
+            for pdf_path, new_pdf_path, date in planned:
+                if os.path.abspath(pdf_path) != os.path.abspath(new_pdf_path) and os.path.exists(new_pdf_path):
+                    # Only possible if an earlier rename of this batch failed or the
+                    # folder changed since it was listed; never overwrite a file
+                    logging.error(f"Error renaming {pdf_path}: {new_pdf_path} already exists")
+                    if on_applied is not None:
+                        on_applied(pdf_path, new_pdf_path, f"{new_pdf_path} already exists")
+                    continue
+                started = time.perf_counter()
+                try:
+                    os.rename(pdf_path, new_pdf_path)
+                except PermissionError:
+                    logging.error(f"Permission denied when renaming {pdf_path}")
+                    if on_applied is not None:
+                        on_applied(pdf_path, new_pdf_path, "Permission denied")
+                    continue
+                except Exception as e:
+                    logging.error(f"Error renaming {pdf_path}: {e}")
+                    if on_applied is not None:
+                        on_applied(pdf_path, new_pdf_path, str(e))
+                    continue
+                finally:
+                    if self.profile:
+                        self.durations[pdf_path] = time.perf_counter() - started
+                logging.info(f"Renamed: {pdf_path} -> {new_pdf_path}")
+                renamed += 1
+                self.completed.append((pdf_path, new_pdf_path))
+                if journal is not None:
+                    journal.write(json.dumps({'run': self.run_id, 'src': pdf_path, 'dst': new_pdf_path}) + '\n')
+                    journal.flush()
+                if self.stamper is not None and date is not None:
+                    self.stamper(new_pdf_path, date)
+                if on_applied is not None:
+                    on_applied(pdf_path, new_pdf_path, None)
+        finally:
+            if journal is not None:
+                journal.close()
+        return renamed
+
+
+def undo_journal(journal_path, dry_run=False):
+    """Roll back the renames recorded in a journal, newest first. Returns (undone, failed)."""
+    renames = []
+    undone_keys = set()
+    with open(journal_path, 'r', encoding='utf-8') as journal:
+        for line in journal:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get('undo'):
+                undone_keys.add((entry['run'], entry['src'], entry['dst']))
+            else:
+                renames.append(entry)
+
+    undone = 0
+    failed = 0
+    with open(journal_path, 'a', encoding='utf-8') as journal:
+        for entry in reversed(renames):
+            key = (entry['run'], entry['src'], entry['dst'])
+            if key in undone_keys:
+                continue
+            src, dst = entry['src'], entry['dst']
+            if not os.path.exists(dst) or (os.path.exists(src) and os.path.abspath(src) != os.path.abspath(dst)):
+                logging.error(f"Cannot undo {dst} -> {src}: file missing or original name taken")
+                failed += 1
+                continue
+            if dry_run:
+                logging.info(f"Would rename back: {dst} -> {src}")
+                undone += 1
+                continue
+            try:
+                os.rename(dst, src)
+            except OSError as e:
+                logging.error(f"Error renaming {dst} back to {src}: {e}")
+                failed += 1
+                continue
+            logging.info(f"Renamed back: {dst} -> {src}")
+            # Appended, so undoing twice does not rename files again
+            journal.write(json.dumps({'run': entry['run'], 'src': src, 'dst': dst, 'undo': True}) + '\n')
+            journal.flush()
+            undone += 1
+    return undone, failed
+
+
+STRATEGY_STAGES = ['metadata', 'filename', 'content']
+DEFAULT_STRATEGY = ('content',)
+
+XMP_NAMESPACES = {
+    'x': 'adobe:ns:meta/',
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'xmp': 'http://ns.adobe.com/xap/1.0/',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+}
+
+# Confidence rules for metadata. Dates must be plausible for a document in the
+# archive, and ModDate is only used when no creation date exists, because
+# editing or signing a PDF rewrites it.
+METADATA_MIN_DATE = datetime.datetime(1990, 1, 1)
+PDF_DATE = re.compile(r'^(?:D:)?(\d{4})(\d{2})?(\d{2})?')
+XMP_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})')
+# Titles that office and scanner software generate without knowing the content
+GENERIC_TITLE = re.compile(
+    r'^(?:microsoft \w+ - |untitled|unbenannt|scan|img|dokument\d|document\d)|\.(?:pdf|docx?|odt|tiff?|jpe?g)$',
+    re.IGNORECASE
+)
+
+
+def parse_strategy(value):
+    strategy = tuple(stage.strip() for stage in value.split(',') if stage.strip())
+    unknown = [stage for stage in strategy if stage not in STRATEGY_STAGES]
+    if not strategy or unknown:
+        raise argparse.ArgumentTypeError(
+            f"invalid strategy {value!r}, use a comma separated list of {', '.join(STRATEGY_STAGES)}"
+        )
+    return strategy
+
+
+def _metadata_date(value, pattern):
+    if not isinstance(value, str):
+        return None
+    match = pattern.match(value.strip())
+    if not match or not match.group(2) or not match.group(3):
+        return None
+    try:
+        date = datetime.datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+    if not METADATA_MIN_DATE <= date <= datetime.datetime.now():
+        return None
+    return date
+
+
+def read_xmp(pdf):
+    """Return CreateDate, ModifyDate and title from the XMP packet, if present."""
+    from pdfminer.pdftypes import resolve1
+
+    fields = {}
+    stream = resolve1(pdf.doc.catalog.get('Metadata'))
+    if stream is None or not hasattr(stream, 'get_data'):
+        return fields
+    try:
+        root = ElementTree.fromstring(stream.get_data())
+    except ElementTree.ParseError:
+        return fields
+
+    for description in root.iter(f"{{{XMP_NAMESPACES['rdf']}}}Description"):
+        for name in ('CreateDate', 'ModifyDate'):
+            key = f"{{{XMP_NAMESPACES['xmp']}}}{name}"
+            value = description.get(key) or description.findtext(key)
+            if value and name not in fields:
+                fields[name] = value
+        title = description.find('dc:title', XMP_NAMESPACES)
+        if title is not None and 'title' not in fields:
+            item = title.find('.//rdf:li', XMP_NAMESPACES)
+            text = item.text if item is not None else title.text
+            if text and text.strip():
+                fields['title'] = text.strip()
+    return fields
+
+
+def extract_metadata(pdf, index):
+    """Date and title from the document info dictionary and XMP, None where not trusted."""
+    info = pdf.metadata or {}
+    xmp = read_xmp(pdf)
+
+    date = (_metadata_date(info.get('CreationDate'), PDF_DATE)
+            or _metadata_date(xmp.get('CreateDate'), XMP_DATE))
+    if date is None and not info.get('CreationDate') and not xmp.get('CreateDate'):
+        date = (_metadata_date(info.get('ModDate'), PDF_DATE)
+                or _metadata_date(xmp.get('ModifyDate'), XMP_DATE))
+
+    title = None
+    for candidate in (info.get('Title'), xmp.get('title')):
+        if isinstance(candidate, str) and candidate.strip() and not GENERIC_TITLE.search(candidate.strip()):
+            # Only titles that name a known document type are trusted
+            title = index.find_title(candidate)
+            if title is not None:
+                break
+    return date, title
+
+
+def _analysis_result(pdf_path, date, title, name_format):
+    result = {'path': pdf_path, 'date': date, 'title': title, 'new_name': None, 'error': None,
+              'pages_parsed': 0, 'sources': {}, 'resolved_by': None}
+    if date:
+        # Format the filename according to the provided format
+        date_str = date.strftime('%Y%m%d')
+        new_pdf_name = name_format.format(date=date_str, title=title)
+        if not new_pdf_name.endswith('.pdf'):
+            new_pdf_name += '.pdf'
+        result['new_name'] = new_pdf_name
+    return result
+
+
+def _page_text(page, text_mode='layout'):
+    if text_mode == 'simple':
+        # Skips the word and line clustering of extract_text()
+        return page.extract_text_simple()
+    return page.extract_text()
+
+
+class ResourceLimitExceeded(BaseException):
+    """A file broke one of the per-file limits and is quarantined instead of renamed.
+
+    A BaseException, so the timeout raised from the signal handler passes the
+    `except Exception` blocks of pdfplumber and pdfminer instead of being
+    swallowed or wrapped by them.
+    """
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+class ResourceLimits:
+    """Per-file limits for pathological PDFs.
+
+    A timeout or memory cap makes the files run in worker processes, so a
+    file that hangs or blows up only takes its own worker down. Sizes are
+    in bytes, the timeout in seconds.
+    """
+
+    def __init__(self, timeout=None, max_memory=None, max_size=None, max_pages=None):
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.max_size = max_size
+        self.max_pages = max_pages
+
+    @property
+    def isolated(self):
+        return bool(self.timeout or self.max_memory)
+
+    def check_size(self, pdf_path):
+        if self.max_size is not None:
+            size = os.path.getsize(pdf_path)
+            if size > self.max_size:
+                raise ResourceLimitExceeded('size', f"{size} bytes, limit is {int(self.max_size)}")
+
+
+def _status_value(field):
+    # Memory figures from /proc/self/status in bytes, None where unavailable
+    try:
+        with open('/proc/self/status', 'r') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def reset_peak_memory():
+    # Linux resets the peak resident set size (VmHWM) when "5" is written to clear_refs
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def peak_memory():
+    """Peak resident memory of this process in bytes, since the last reset_peak_memory() on Linux."""
+    peak = _status_value('VmHWM')
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes everywhere but macOS
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+    return peak
+
+
+def _init_worker(max_memory=None):
+    if max_memory and resource is not None:
+        # Only the address space can be capped; leave room for what the worker already maps
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = (_status_value('VmSize') or 0) + max_memory
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+@contextlib.contextmanager
+def _time_limit(seconds):
+    # SIGALRM only exists on Unix and only reaches the main thread; elsewhere
+    # the watchdog in iter_analyses is the only timeout
+    if not seconds or not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expired(signum, frame):
+        raise ResourceLimitExceeded('timeout', f"took longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _limit_error(error):
+    """Return the ResourceLimitExceeded or MemoryError behind error, if any.
+
+    pdfplumber re-raises whatever goes wrong while laying out a page as
+    PdfminerException(original), so the original is looked for in the
+    exception's first argument and its cause or context.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, (ResourceLimitExceeded, MemoryError)):
+            return error
+        seen.add(id(error))
+        wrapped = error.args[0] if error.args and isinstance(error.args[0], BaseException) else None
+        error = wrapped or error.__cause__ or error.__context__
+    return None
+
+
+def _page_count(pdf):
+    # Read from the page tree root, so no page is loaded
+    from pdfminer.pdftypes import resolve1
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages[:3]:  # Only process first 3 pages for efficiency
-                text += page.extract_text() or ""
-            
-            # Pass filename to extract_date as fallback
-            date = extract_date(text, pdf_path)
-            title = extract_title(text, keywords_file)
-            
-        if date:
-            # Format the filename according to the provided format
-            date_str = date.strftime('%Y%m%d')
-            new_pdf_name = name_format.format(date=date_str, title=title)
-            if not new_pdf_name.endswith('.pdf'):
-                new_pdf_name += '.pdf'
-                
-            # Skip if the file already has the correct name format
-            if os.path.basename(pdf_path) == new_pdf_name:
-                logging.info(f"File already has correct name: {pdf_path}")
-                return True, pdf_path
-                
-            new_pdf_path = rename_pdf(pdf_path, new_pdf_name, dry_run)
-            return True, new_pdf_path
+        return int(resolve1(resolve1(pdf.doc.catalog['Pages'])['Count']))
+    except Exception:
+        return None
+
+
+class MetricsReport:
+    """Collects per-file stage timings and summarises them per stage.
+
+    Each record is written as one JSON line to `path` as soon as it is added;
+    close() writes the aggregate summary next to it as `<path>.summary.json`.
+    """
+
+    STAGES = ('cache_lookup', 'open', 'metadata', 'extract_text', 'date_regex', 'date_parse',
+              'keyword_matching', 'rename', 'total')
+
+    def __init__(self, path=None, slowest=10):
+        self.path = path
+        self.slowest_count = slowest
+        self.samples = {}
+        self.files = 0
+        self.errors = 0
+        self._slowest = []
+        self._started = time.perf_counter()
+        self._out = open(path, 'w', encoding='utf-8') if path else None
+
+    def add(self, result, rename_time=None):
+        timings = dict(result.get('timings') or {})
+        if rename_time is not None:
+            timings['rename'] = rename_time
+            timings['total'] = timings.get('total', 0.0) + rename_time
+        record = {
+            'path': result['path'],
+            'timings': timings,
+            'pages_parsed': result['pages_parsed'],
+            'resolved_by': result['resolved_by'],
+            'error': result['error'],
+            'peak_memory': result.get('peak_memory'),
+        }
+        if self._out is not None:
+            self._out.write(json.dumps(record) + '\n')
+
+        self.files += 1
+        if result['error'] is not None:
+            self.errors += 1
+        for stage, seconds in timings.items():
+            self.samples.setdefault(stage, []).append(seconds)
+        total = timings.get('total', 0.0)
+        # Keep only the slowest files around, smallest first
+        if len(self._slowest) < self.slowest_count:
+            heapq.heappush(self._slowest, (total, result['path']))
+        elif total > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (total, result['path']))
+
+    @staticmethod
+    def _percentile(ordered, fraction):
+        # Nearest-rank percentile of an already sorted list
+        rank = max(1, -(-len(ordered) * fraction // 1))
+        return ordered[int(rank) - 1]
+
+    def summary(self):
+        stages = {}
+        ordered_stages = [stage for stage in self.STAGES if stage in self.samples]
+        ordered_stages += sorted(set(self.samples) - set(self.STAGES))
+        for stage in ordered_stages:
+            ordered = sorted(self.samples[stage])
+            stages[stage] = {
+                'count': len(ordered),
+                'total': sum(ordered),
+                'p50': self._percentile(ordered, 0.50),
+                'p95': self._percentile(ordered, 0.95),
+                'p99': self._percentile(ordered, 0.99),
+                'max': ordered[-1],
+            }
+        return {
+            'files': self.files,
+            'errors': self.errors,
+            'wall_time': time.perf_counter() - self._started,
+            'stages': stages,
+            'slowest': [{'path': path, 'total': total} for total, path in sorted(self._slowest, reverse=True)],
+        }
+
+    def log_summary(self, summary=None):
+        summary = summary or self.summary()
+        logging.info(f"Profile of {summary['files']} files in {summary['wall_time']:.2f}s:")
+        for stage, stats in summary['stages'].items():
+            logging.info(f"  {stage:<16} total {stats['total']:8.3f}s  p50 {stats['p50'] * 1000:8.1f}ms  "
+                         f"p95 {stats['p95'] * 1000:8.1f}ms  p99 {stats['p99'] * 1000:8.1f}ms  "
+                         f"max {stats['max'] * 1000:8.1f}ms")
+        for entry in summary['slowest']:
+            logging.info(f"  slowest: {entry['total'] * 1000:8.1f}ms  {entry['path']}")
+
+    def close(self):
+        summary = self.summary()
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+            with open(f"{self.path}.summary.json", 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+        return summary
+
+
+def analyze_pdf(pdf_path, keywords_file, name_format="{date}_{title}", text_mode='layout', early_stop=True,
+                strategy=DEFAULT_STRATEGY, profile=False, limits=None):
+    # Pure extraction step: no renaming and no logging, so it can run in a
+    # worker process while the main process commits renames in order.
+    timer = StageTimer() if profile else NULL_TIMER
+    started = time.perf_counter()
+    if limits is not None:
+        reset_peak_memory()
+    try:
+        max_pages = None
+        if limits is not None:
+            limits.check_size(pdf_path)
+            max_pages = limits.max_pages
+        with _time_limit(limits.timeout if limits is not None else None):
+            result = _analyze_pdf(pdf_path, keywords_file, name_format, text_mode, early_stop, strategy, timer,
+                                  max_pages)
+    except (ResourceLimitExceeded, Exception) as e:
+        limit_error = _limit_error(e)
+        if isinstance(limit_error, ResourceLimitExceeded):
+            result = _quarantined_analysis(pdf_path, limit_error.reason, limit_error)
+        elif isinstance(limit_error, MemoryError):
+            result = _quarantined_analysis(pdf_path, 'memory', 'memory limit exceeded')
         else:
-            logging.warning(f"No date found in {pdf_path}")
-            return False, pdf_path
-            
-    except Exception as e:
-        logging.error(f"Error processing {pdf_path}: {e}")
+            result = _failed_analysis(pdf_path, e)
+    if limits is not None:
+        result['peak_memory'] = peak_memory()
+    if profile:
+        timer.durations['total'] = time.perf_counter() - started
+        result['timings'] = timer.durations
+    return result
+
+
+def _analyze_pdf(pdf_path, keywords_file, name_format, text_mode, early_stop, strategy, timer, max_pages=None):
+    index = load_keyword_index(keywords_file)
+    date = None
+    title = None
+    sources = {}
+    text = None
+    pages_parsed = 0
+
+    import pdfplumber
+
+    # Only process the first pages for efficiency
+    with timer.stage('open'):
+        pdf = pdfplumber.open(pdf_path, pages=list(range(1, MAX_PAGES + 1)))
+    with pdf:
+        if max_pages is not None:
+            page_count = _page_count(pdf)
+            if page_count is not None and page_count > max_pages:
+                raise ResourceLimitExceeded('pages', f"{page_count} pages, limit is {max_pages}")
+
+        # Cheap sources first, page content only for what is still missing
+        for stage in strategy:
+            if stage == 'metadata':
+                with timer.stage('metadata'):
+                    meta_date, meta_title = extract_metadata(pdf, index)
+                if date is None and meta_date is not None:
+                    date, sources['date'] = meta_date, stage
+                if title is None and meta_title is not None:
+                    title, sources['title'] = meta_title, stage
+
+            elif stage == 'filename':
+                if date is None:
+                    date = extract_date('', pdf_path, timer)
+                    if date is not None:
+                        sources['date'] = stage
+
+            elif stage == 'content':
+                with timer.stage('open'):
+                    pages = pdf.pages
+                text = ""
+                for page in pages:
+                    with timer.stage('extract_text'):
+                        text += _page_text(page, text_mode) or ""
+                        pages_parsed += 1
+                        # Free the page's parsed objects before moving on to the next one
+                        page.close()
+
+                    # Most letters carry date and subject on the first page
+                    if early_stop:
+                        with timer.stage('date_regex'):
+                            date_found = date is not None or find_date_string(text) is not None
+                        if date_found:
+                            with timer.stage('keyword_matching'):
+                                title_found = title is not None or index.find_title(text) is not None
+                            if title_found:
+                                break
+
+                if date is None:
+                    # Pass filename to extract_date as fallback
+                    date = extract_date(text, pdf_path, timer)
+                    if date is not None:
+                        sources['date'] = stage
+                if title is None:
+                    with timer.stage('keyword_matching'):
+                        title = extract_title(text, keywords_file)
+                    sources['title'] = stage
+
+            if date is not None and title is not None:
+                break
+
+    result = _analysis_result(pdf_path, date, title or "Unknown", name_format)
+    if text is not None:
+        result['text_digest'] = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    result['pages_parsed'] = pages_parsed
+    result['sources'] = sources
+    if date is not None:
+        # The stage that completed the file, in chain order
+        result['resolved_by'] = max(sources.values(), key=strategy.index)
+    return result
+
+
+def _failed_analysis(pdf_path, error):
+    result = _analysis_result(pdf_path, None, None, '')
+    result['error'] = str(error)
+    return result
+
+
+def _quarantined_analysis(pdf_path, reason, error):
+    result = _failed_analysis(pdf_path, error)
+    result['quarantined'] = reason
+    return result
+
+
+def _finished(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def commit_analysis(result, dry_run=False, planner=None, stamper=None):
+    pdf_path = result['path']
+    if result['error'] is not None:
+        logging.error(f"Error processing {pdf_path}: {result['error']}")
         return False, pdf_path
 
+    new_pdf_name = result['new_name']
+    if not new_pdf_name:
+        logging.warning(f"No date found in {pdf_path}")
+        return False, pdf_path
+
+    # Skip if the file already has the correct name format
+    if os.path.basename(pdf_path) == new_pdf_name:
+        logging.info(f"File already has correct name: {pdf_path}")
+        if stamper is not None:
+            stamper(pdf_path, result['date'])
+        return True, pdf_path
+
+    if planner is not None:
+        # Renamed later by planner.apply(), which also stamps the dates
+        return True, planner.assign(pdf_path, new_pdf_name, result['date'])
+    new_pdf_path = rename_pdf(pdf_path, new_pdf_name, dry_run)
+    if stamper is not None:
+        stamper(pdf_path if dry_run else new_pdf_path, result['date'])
+    return True, new_pdf_path
+
+
+def _timed_lookup(cache, pdf_path, name_format, profile=False):
+    # Returns the cached result (or None) and the seconds the lookup took when profiling
+    if not profile:
+        return cache.lookup(pdf_path, name_format), None
+    started = time.perf_counter()
+    result = cache.lookup(pdf_path, name_format)
+    elapsed = time.perf_counter() - started
+    if result is not None:
+        result['timings'] = {'cache_lookup': elapsed, 'total': elapsed}
+    return result, elapsed
+
+
+def _add_lookup_time(result, elapsed):
+    if elapsed is not None and result.get('timings') is not None:
+        result['timings']['cache_lookup'] = elapsed
+        result['timings']['total'] += elapsed
+
+
+def analyze_pdf_cached(pdf_path, keywords_file, name_format="{date}_{title}", cache=None, **options):
+    lookup_time = None
+    if cache is not None:
+        result, lookup_time = _timed_lookup(cache, pdf_path, name_format, options.get('profile', False))
+        if result is not None:
+            return result
+    result = analyze_pdf(pdf_path, keywords_file, name_format, **options)
+    _add_lookup_time(result, lookup_time)
+    if cache is not None:
+        cache.store(result)
+    return result
+
+
+def process_pdf(pdf_path, keywords_file, name_format="{date}_{title}", dry_run=False, cache=None, stamper=None,
+                **options):
+    result = analyze_pdf_cached(pdf_path, keywords_file, name_format, cache, **options)
+    return commit_analysis(result, dry_run, stamper=stamper)
+
+
+# Without --timeout a file that hangs in a worker is still given up after
+# this long, so it cannot hold up the ordered results and idle the pool
+STUCK_WORKER_TIMEOUT = 600
+
+
+class _WorkerStuck(Exception):
+    pass
+
+
+def _kill_workers(executor):
+    """Kill the worker processes of a ProcessPoolExecutor, e.g. one hanging inside C code.
+
+    The executor has no public way to reach its processes, so this relies on
+    CPython's private `_processes` dict (pid -> Process) and does nothing
+    where it is missing.
+    """
+    processes = getattr(executor, '_processes', None) or {}
+    for process in list(processes.values()):
+        process.kill()
+
+
+class ExtractionPool:
+    """Worker processes for iter_analyses that outlive a single call.
+
+    serve() keeps one for its whole lifetime, so a request does not start
+    workers (and, with spawn, import pdfplumber in them) again. The pool may
+    be shared between threads; a crashed or hung executor is replaced once,
+    by whichever caller notices first.
+    """
+
+    def __init__(self, workers, max_memory=None):
+        self.workers = workers
+        self.max_memory = max_memory
+        self._lock = threading.Lock()
+        # Which executor each future was submitted to
+        self._owners = weakref.WeakKeyDictionary()
+        self.executor = self.new_executor()
+
+    def new_executor(self, max_workers=None):
+        return ProcessPoolExecutor(max_workers=max_workers or self.workers, initializer=_init_worker,
+                                   initargs=(self.max_memory,))
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            future = self.executor.submit(fn, *args, **kwargs)
+            self._owners[future] = self.executor
+        return future
+
+    def restart(self, future, kill=False):
+        """Replace the executor that ran future, unless that happened already."""
+        with self._lock:
+            executor = self._owners.get(future)
+            if executor is not self.executor:
+                return
+            if kill:
+                _kill_workers(executor)
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self.new_executor()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_analyses(pdf_files, keywords_file, name_format="{date}_{title}", workers=1, cache=None, pool=None,
+                  **options):
+    # Yields analysis results in the order of pdf_files. With more than one
+    # worker, or with resource limits that need isolation, the extraction runs
+    # in a process pool, pool if given or else one for this call; the caller
+    # stays the only place where files are renamed. The cache is only touched
+    # from this process.
+    limits = options.get('limits')
+    if pool is None and workers <= 1 and not (limits is not None and limits.isolated):
+        for pdf_path in pdf_files:
+            yield analyze_pdf_cached(pdf_path, keywords_file, name_format, cache, **options)
+        return
+
+    remaining = iter(pdf_files)
+    pending = deque()
+    lookup_times = {}
+    timeout = limits.timeout if limits is not None else None
+    stuck_after = 2 * timeout + 5 if timeout else STUCK_WORKER_TIMEOUT
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ExtractionPool(workers, limits.max_memory if limits is not None else None)
+
+    def submit(pdf_path):
+        cached = None
+        if cache is not None and pdf_path not in lookup_times:
+            cached, lookup_times[pdf_path] = _timed_lookup(cache, pdf_path, name_format,
+                                                           options.get('profile', False))
+        if cached is not None:
+            pending.append((pdf_path, _finished(cached)))
+        else:
+            pending.append((pdf_path, pool.submit(analyze_pdf, pdf_path, keywords_file, name_format, **options)))
+
+    def wait(future):
+        # Backstop for files the timer in the worker cannot interrupt, e.g. a
+        # hang inside C code, or for any hang without --timeout: give up on
+        # the oldest file once it has been running for stuck_after seconds.
+        deadline = None
+        while True:
+            try:
+                return future.result(timeout=1)
+            except FutureTimeoutError:
+                if not future.running():
+                    continue
+                if deadline is None:
+                    deadline = time.monotonic() + stuck_after
+                elif time.monotonic() > deadline:
+                    raise _WorkerStuck()
+
+    def retry_alone(paths):
+        # Reruns the files that were in flight when a worker died, one at a
+        # time in a pool of their own, so a crash is pinned on the file that
+        # caused it. A file that crashes its worker twice is quarantined.
+        results = []
+        solo = pool.new_executor(1)
+        try:
+            for path in paths:
+                crashes = 0
+                while True:
+                    try:
+                        result = wait(solo.submit(analyze_pdf, path, keywords_file, name_format, **options))
+                    except BrokenProcessPool:
+                        solo.shutdown(wait=False, cancel_futures=True)
+                        solo = pool.new_executor(1)
+                        crashes += 1
+                        if crashes < 2:
+                            continue
+                        result = _quarantined_analysis(path, 'crash', 'worker process crashed')
+                    except _WorkerStuck:
+                        _kill_workers(solo)
+                        solo.shutdown(wait=False, cancel_futures=True)
+                        solo = pool.new_executor(1)
+                        result = _quarantined_analysis(path, 'timeout', f"worker killed after {stuck_after}s")
+                    except Exception as e:
+                        result = _failed_analysis(path, e)
+                    break
+                results.append((path, _finished(result)))
+        finally:
+            solo.shutdown(wait=True, cancel_futures=True)
+        return results
 
-def list_pdf_files(folder, recursive=False):
+    try:
+        # Keep a bounded window of files in flight instead of queueing everything
+        for pdf_path in itertools.islice(remaining, pool.workers * 4):
+            submit(pdf_path)
+
+        while pending:
+            pdf_path, future = pending.popleft()
+            try:
+                result = wait(future)
+            except (BrokenProcessPool, CancelledError, _WorkerStuck) as e:
+                # A worker died (e.g. a crash inside the PDF parser) or hangs,
+                # or another caller of a shared pool restarted it. Restart the
+                # pool; finished results are kept.
+                stuck = isinstance(e, _WorkerStuck)
+                pool.restart(future, kill=stuck)
+                in_flight = [(pdf_path, future)] + list(pending)
+                pending.clear()
+                suspects = []
+                for path, previous in in_flight:
+                    if previous.done() and not previous.cancelled() and previous.exception() is None:
+                        pending.append((path, previous))
+                    elif stuck and path == pdf_path:
+                        pending.append((path, _finished(_quarantined_analysis(
+                            path, 'timeout', f"worker killed after {stuck_after}s"))))
+                    elif stuck:
+                        # Only caught up in the kill
+                        submit(path)
+                    else:
+                        # Any of them may have crashed the pool; keep their place in the order
+                        suspects.append(path)
+                        pending.append((path, None))
+                if suspects:
+                    retried = dict(retry_alone(suspects))
+                    for index, (path, previous) in enumerate(pending):
+                        if previous is None:
+                            pending[index] = (path, retried[path])
+                continue
+            except Exception as e:
+                result = _failed_analysis(pdf_path, e)
+
+            if cache is not None and not result.get('cached'):
+                _add_lookup_time(result, lookup_times.pop(pdf_path, None))
+                cache.store(result)
+
+            next_path = next(remaining, None)
+            if next_path is not None:
+                submit(next_path)
+            yield result
+    finally:
+        if own_pool:
+            pool.shutdown()
+        else:
+            # Stopped early, e.g. the client of serve() went away
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+
+
+def _result_to_json(result):
+    data = dict(result)
+    data['date'] = result['date'].isoformat() if result['date'] else None
+    return data
+
+
+def _result_from_json(data):
+    data['date'] = datetime.datetime.fromisoformat(data['date']) if data['date'] else None
+    return data
+
+
+class _ExtractionRequestHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line: {"paths": [...], "format": "{date}_{title}"},
+    # answered with one line {"results": [...]} in the order of the paths.
+
+    def handle(self):
+        server = self.server
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                paths = [str(path) for path in request['paths']]
+                name_format = request.get('format') or "{date}_{title}"
+            except (ValueError, KeyError, TypeError) as e:
+                response = {'error': f"Invalid request: {e}"}
+            else:
+                results = iter_analyses(paths, server.keywords_file, name_format, server.workers, server.cache,
+                                        server.pool, **server.options)
+                response = {'results': [_result_to_json(result) for result in results]}
+                logging.info(f"Analyzed {len(paths)} files")
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+def serve(socket_path, keywords_file, workers=1, cache=None, **options):
+    """Answer analysis requests on a Unix socket until interrupted.
+
+    pdfplumber, dateparser's language data, the keyword index and the
+    worker processes are set up once, so a request only pays for the
+    extraction itself. Every client connection is served by its own thread.
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        logging.error("Server mode needs Unix domain sockets, which this platform does not support")
+        return
+
+    # A socket left behind by a server that did not shut down cleanly
+    if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+        os.unlink(socket_path)
+
+    import pdfplumber  # noqa: F401
+    load_keyword_index(keywords_file)
+    _dateparser_parse('1. März 2020', ('de',))
+
+    limits = options.get('limits')
+    pool = None
+    if workers > 1 or (limits is not None and limits.isolated):
+        pool = ExtractionPool(workers, limits.max_memory if limits is not None else None)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _ExtractionRequestHandler)
+    # Idle clients must not keep the server from shutting down
+    server.daemon_threads = True
+    server.keywords_file = keywords_file
+    server.workers = workers
+    server.cache = cache
+    server.pool = pool
+    server.options = options
+    logging.info(f"Serving on {socket_path}, press Ctrl+C to stop")
+    # Service managers stop with SIGTERM, shut down the same way as on Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+        if pool is not None:
+            pool.shutdown()
+
+
+# Seconds ExtractionClient waits to connect and for the answer to one batch
+SERVER_TIMEOUT = 120
+
+
+class ExtractionClient:
+    """Sends files to a running serve() process instead of extracting them locally.
+
+    Yields the same results as iter_analyses, so renaming, the journal and
+    the summary work unchanged; only extraction moves to the server.
+    """
+
+    def __init__(self, socket_path, batch_size=50, timeout=SERVER_TIMEOUT):
+        self.socket_path = socket_path
+        self.batch_size = batch_size
+        self.connected = False
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # A busy or stuck server then raises socket.timeout, and the files are extracted locally
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+        self._stream = self.sock.makefile('rwb')
+        self.connected = True
+
+    def analyze(self, pdf_paths, name_format="{date}_{title}"):
+        request = {'paths': [os.path.abspath(pdf_path) for pdf_path in pdf_paths], 'format': name_format}
+        self._stream.write(json.dumps(request).encode('utf-8') + b'\n')
+        self._stream.flush()
+        line = self._stream.readline()
+        if not line:
+            raise ConnectionError(f"Extraction server at {self.socket_path} closed the connection")
+        response = json.loads(line)
+        if 'error' in response:
+            raise ConnectionError(response['error'])
+        answers = response.get('results') or []
+        if len(answers) != len(pdf_paths):
+            # E.g. a server of another version; zip() would silently drop the rest
+            raise ConnectionError(f"Extraction server at {self.socket_path} answered {len(answers)} "
+                                  f"of {len(pdf_paths)} files")
+
+        results = []
+        for pdf_path, data in zip(pdf_paths, answers):
+            result = _result_from_json(data)
+            # Report the path as given, not the absolute one sent to the server
+            result['path'] = pdf_path
+            results.append(result)
+        return results
+
+    def iter_analyses(self, pdf_files, name_format="{date}_{title}", fallback=None):
+        """Yield the results of pdf_files, extracted by the server in batches.
+
+        If the server fails or goes away, the files it has not answered are
+        passed to fallback(files), e.g. a local iter_analyses, and so are
+        all files of later calls. Without a fallback the error is raised.
+        """
+        remaining = iter(pdf_files)
+        while True:
+            batch = list(itertools.islice(remaining, self.batch_size))
+            if not batch:
+                return
+            if not self.connected and fallback is not None:
+                yield from fallback(itertools.chain(batch, remaining))
+                return
+            try:
+                results = self.analyze(batch, name_format)
+            except (OSError, ValueError) as e:
+                if fallback is None:
+                    raise
+                logging.warning(f"Extraction server at {self.socket_path} failed ({e}), extracting locally")
+                self.close()
+                yield from fallback(itertools.chain(batch, remaining))
+                return
+            yield from results
+
+    def close(self):
+        self.connected = False
+        # Closing flushes, which fails if the server is gone; the socket is closed anyway
+        with contextlib.suppress(OSError):
+            self._stream.close()
+        self.sock.close()
+
+
+def list_pdf_files(folder, recursive=False, exclude=()):
     folder_path = Path(folder)
     if not folder_path.exists():
         logging.error(f"Folder not found: {folder}")
         return []
-        
-    if recursive:
-        return [str(pdf) for pdf in folder_path.glob('**/*.pdf')]
-    else:
-        return [str(pdf) for pdf in folder_path.glob('*.pdf')]
+    return list(iter_pdf_files(folder, recursive, exclude))
 
 
 def setup_logging(verbose=False):
@@ -203,61 +1860,394 @@ def parse_args():
                         help='Path to keywords file (default: projects/components/keywords.txt)')
     parser.add_argument('-r', '--recursive', action='store_true', 
                         help='Process folders recursively')
+    parser.add_argument('-x', '--exclude', action='append', default=[], metavar='PATTERN',
+                        help='Skip files and folders matching this glob pattern (can be repeated)')
     parser.add_argument('-f', '--format', default='{date}_{title}',
                         help='Filename format (default: {date}_{title})')
     parser.add_argument('-d', '--dry-run', action='store_true',
                         help='Preview changes without renaming files')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='Enable verbose logging')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of worker processes for text extraction, 0 uses all CPU cores; a file still '
+                             f'running after {STUCK_WORKER_TIMEOUT}s is given up, see --timeout (default: 1)')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='SQLite file to cache extraction results in between runs')
+    parser.add_argument('--cache-hash', action='store_true',
+                        help='Also match cache entries by content hash (reads every cache miss once more)')
+    parser.add_argument('--cache-clear', action='store_true',
+                        help='Clear the extraction cache before processing')
+    parser.add_argument('--cache-max-entries', type=int, default=100000,
+                        help='Maximum number of cached files, least recently used are evicted (default: 100000)')
+    parser.add_argument('--text-mode', choices=['layout', 'simple'], default='layout',
+                        help='Text extraction mode, simple skips word and line clustering (default: layout)')
+    parser.add_argument('--all-pages', action='store_true',
+                        help=f'Always read the first {MAX_PAGES} pages instead of stopping once date and title are found')
+    parser.add_argument('--strategy', type=parse_strategy, default=DEFAULT_STRATEGY,
+                        help='Comma separated sources to try in order: metadata, filename, content (default: content)')
+    parser.add_argument('--journal', metavar='PATH',
+                        help='Append every rename to this journal so the run can be undone')
+    parser.add_argument('--undo', metavar='JOURNAL',
+                        help='Roll back the renames recorded in a journal and exit')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time each processing stage and log a summary with percentiles and the slowest files')
+    parser.add_argument('--metrics-out', metavar='PATH',
+                        help='Write per-file timings as JSON lines to PATH and the summary to PATH.summary.json '
+                             '(implies --profile)')
+    parser.add_argument('--duplicates', choices=DuplicateIndex.DUPLICATE_POLICIES,
+                        help='Detect byte-identical copies before extraction and report them, skip them or '
+                             'replace them by hard links; copies reuse the date and title of the original')
+    parser.add_argument('--duplicate-index', metavar='PATH',
+                        help='SQLite file keeping the content hashes of the archive between runs (with --duplicates)')
+    parser.add_argument('--set-dates', action='store_true',
+                        help='Also set the timestamps of every renamed file to the extracted date, '
+                             'like editCreationDate does afterwards')
+    parser.add_argument('--date-backend', default='auto',
+                        choices=['auto', 'mtime', 'atime-mtime', 'birthtime', 'fake'],
+                        help='Timestamps written by --set-dates, see editCreationDate (default: auto)')
+    parser.add_argument('--serve', metavar='SOCKET',
+                        help='Run as extraction server on this Unix socket, keeping modules and caches loaded')
+    parser.add_argument('--server', metavar='SOCKET',
+                        help='Let the extraction server on this socket read the files, renaming stays local')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='Give up on a file after this many seconds (runs files in worker processes)')
+    parser.add_argument('--max-memory', type=int, metavar='MB',
+                        help='Memory a worker may allocate for one file (runs files in worker processes)')
+    parser.add_argument('--max-size', type=float, metavar='MB',
+                        help='Skip files larger than this')
+    parser.add_argument('--max-pages', type=int, metavar='N',
+                        help='Skip files with more than N pages')
+    parser.add_argument('--quarantine', metavar='PATH',
+                        help='Append files that hit one of the limits or crash a worker to this JSON lines report')
+    parser.add_argument('--batch', metavar='JOBS',
+                        help="Process the folders or files listed in this file ('-' for stdin) without prompting; "
+                             'a line is a path or a JSON object with "path" and optionally "recursive", '
+                             '"exclude" and "format"')
+    parser.add_argument('--results', default='-', metavar='PATH',
+                        help='Append the JSON line results of --batch to this file (default: stdout)')
     return parser.parse_args()
 
 
+def quarantine_record(result):
+    try:
+        size = os.path.getsize(result['path'])
+    except OSError:
+        size = None
+    return {
+        'path': result['path'],
+        'reason': result['quarantined'],
+        'error': result['error'],
+        'size': size,
+        'peak_memory': result.get('peak_memory'),
+    }
+
+
+def _split_duplicates(pdf_files, index, policy, duplicates):
+    # Yields the files that need extraction and collects byte-identical copies
+    # of already indexed files in duplicates as (path, original)
+    for pdf_path in pdf_files:
+        try:
+            original = index.check(pdf_path)
+        except OSError as e:
+            logging.warning(f"Cannot check {pdf_path} for duplicates: {e}")
+            original = None
+        if original is None:
+            yield pdf_path
+        elif policy == 'skip':
+            logging.info(f"Skipping duplicate of {original}: {pdf_path}")
+            duplicates.append((pdf_path, original))
+        else:
+            if policy == 'report':
+                logging.warning(f"Duplicate of {original}: {pdf_path}")
+            duplicates.append((pdf_path, original))
+
+
+def process_folder(folder_path, args, workers=1, cache=None, metrics=None, limits=None, client=None,
+                   duplicate_index=None, stamper=None, on_result=None):
+    """Rename the PDF files in a folder (or a single PDF file).
+
+    on_result is called with a record (path, status, new_path, date, title,
+    resolved_by, error) for every file once it is done: right after its
+    analysis, or for files to rename after the rename.
+    """
+    if not Path(folder_path).exists():
+        logging.error(f"Folder not found: {folder_path}")
+        return 0, 0
+
+    # Files are processed while discovery is still running
+    pdf_files = PdfDiscovery(folder_path, args.recursive, args.exclude)
+    planner = RenamePlanner(args.dry_run, args.journal, profile=metrics is not None, stamper=stamper)
+    success_count = 0
+    pages_parsed = 0
+    resolved = {}
+    profiled = []
+    quarantined = []
+    duplicates = []
+    # Date and title of this run's files, for reuse by their duplicates
+    extracted = {}
+    # Results of the planned renames, reported once they are applied
+    to_report = {}
+
+    def report(result, status, new_path=None, error=None):
+        record = {
+            'path': result['path'],
+            'status': status,
+            'new_path': new_path,
+            'date': result['date'].strftime('%Y-%m-%d') if hasattr(result.get('date'), 'strftime') else result.get('date'),
+            'title': result.get('title'),
+            'resolved_by': result.get('resolved_by'),
+            'error': error or result.get('error'),
+        }
+        if result.get('duplicate_of'):
+            record['duplicate_of'] = result['duplicate_of']
+        on_result(record)
+
+    def on_applied(pdf_path, new_pdf_path, error):
+        result = to_report.pop(pdf_path, None)
+        if result is not None:
+            status = 'error' if error else 'would_rename' if args.dry_run else 'renamed'
+            report(result, status, new_pdf_path, error)
+
+    def analyze_locally(files):
+        return iter_analyses(files, args.keywords, args.format, workers, cache,
+                             text_mode=args.text_mode, early_stop=not args.all_pages,
+                             strategy=args.strategy, profile=metrics is not None, limits=limits)
+
+    def analyze(files):
+        if client is not None:
+            # Falls back to local extraction if the server goes away mid-run
+            return client.iter_analyses(files, args.format, fallback=analyze_locally)
+        return analyze_locally(files)
+
+    def analyze_duplicates():
+        # Runs once all other files are analyzed, so every original of this run is known
+        unknown = []
+        for pdf_path, original in duplicates:
+            if args.duplicates == 'skip':
+                if on_result is not None:
+                    report({'path': pdf_path, 'duplicate_of': original}, 'skipped')
+                continue
+            if args.duplicates == 'hardlink':
+                hardlink_duplicate(pdf_path, original, args.dry_run)
+            if original not in extracted:
+                # Original from an earlier run, extract the copy itself
+                unknown.append(pdf_path)
+                continue
+            date, title = extracted[original]
+            result = _analysis_result(pdf_path, date, title, args.format)
+            result['resolved_by'] = 'duplicate'
+            result['duplicate_of'] = original
+            yield result
+        if unknown:
+            yield from analyze(unknown)
+
+    files = pdf_files
+    if duplicate_index is not None:
+        files = _split_duplicates(pdf_files, duplicate_index, args.duplicates, duplicates)
+    analyses = itertools.chain(analyze(files), analyze_duplicates())
+    for i, result in enumerate(analyses, 1):
+        logging.info(f"Processing file {pdf_files.progress(i)}: {result['path']}")
+        logging.debug(f"Parsed {result['pages_parsed']} page(s) of {result['path']}")
+        pages_parsed += result['pages_parsed']
+        stage = result['resolved_by'] or 'unresolved'
+        resolved[stage] = resolved.get(stage, 0) + 1
+        success, new_path = commit_analysis(result, args.dry_run, planner, stamper)
+        if success:
+            success_count += 1
+        if on_result is not None:
+            if result['error'] is not None:
+                report(result, 'quarantined' if result.get('quarantined') else 'error')
+            elif not success:
+                report(result, 'no_date')
+            elif new_path == result['path']:
+                report(result, 'unchanged', new_path)
+            else:
+                to_report[result['path']] = result
+        if metrics is not None:
+            profiled.append(result)
+        if result.get('quarantined'):
+            quarantined.append(quarantine_record(result))
+        if duplicate_index is not None and result['error'] is None:
+            extracted[result['path']] = (result['date'], result['title'])
+    planner.apply(on_applied if on_result is not None else None)
+    if duplicate_index is not None:
+        # Keep the paths reported for originals valid after renaming
+        for old_path, new_path in planner.completed:
+            duplicate_index.moved(old_path, new_path)
+    # Recorded after the batch rename so each file's record includes its rename time
+    for result in profiled:
+        metrics.add(result, planner.durations.get(result['path']))
+
+    if not pdf_files.discovered:
+        logging.warning(f"No PDF files found in {folder_path}")
+        return 0, 0
+
+    logging.info(f"Found {pdf_files.discovered} PDF files")
+    logging.info(f"Successfully processed {success_count} out of {pdf_files.discovered} files")
+    logging.info(f"Parsed {pages_parsed} pages in total")
+    if args.strategy != DEFAULT_STRATEGY:
+        stages = [*args.strategy, 'cache', 'duplicate', 'unresolved']
+        counts = ', '.join(f"{stage}: {resolved[stage]}" for stage in stages if stage in resolved)
+        logging.info(f"Resolved by stage - {counts}")
+    if cache is not None:
+        logging.info(f"Extraction cache: {cache.hits} hits, {cache.misses} misses")
+    if stamper is not None:
+        logging.info(f"Timestamps: {stamper.summary()}")
+    if duplicates:
+        action = {'report': 'reported', 'skip': 'skipped', 'hardlink': 'hard-linked'}[args.duplicates]
+        logging.info(f"Duplicates: {len(duplicates)} {action}")
+    if quarantined:
+        reasons = {}
+        for record in quarantined:
+            reasons[record['reason']] = reasons.get(record['reason'], 0) + 1
+        counts = ', '.join(f"{reason}: {count}" for reason, count in sorted(reasons.items()))
+        logging.warning(f"Quarantined {len(quarantined)} files - {counts}")
+        if args.quarantine:
+            with open(args.quarantine, 'a', encoding='utf-8') as report:
+                for record in quarantined:
+                    report.write(json.dumps(record) + '\n')
+    return success_count, pdf_files.discovered
+
+
+# Options a --batch job may set for itself
+BATCH_OPTIONS = {'recursive': bool, 'exclude': list, 'format': str}
+
+
+def run_batch(args, workers=1, cache=None, metrics=None, limits=None, client=None, duplicate_index=None,
+              stamper=None):
+    """Process the jobs of args.batch without prompting and return the exit code.
+
+    Writes one JSON line per file to args.results as soon as the file is
+    done, and a summary line with the counts per status at the end. The exit
+    code is 1 when a file or job failed, 2 when the jobs could not be read.
+    """
+    try:
+        writer = ResultWriter(args.results, failed_statuses=('error', 'quarantined'))
+    except OSError as e:
+        logging.error(f"Cannot write results to {args.results}: {e}")
+        return EXIT_USAGE
+
+    try:
+        for number, job, error in iter_jobs(args.batch, 'path', BATCH_OPTIONS):
+            if error is not None:
+                logging.error(f"Job {number}: {error}")
+                writer.write({'job': number, 'status': 'error', 'error': error})
+                continue
+            path = job['path']
+            if not os.path.exists(path):
+                logging.error(f"Job {number}: {path} not found")
+                writer.write({'job': number, 'path': path, 'status': 'error', 'error': 'Path not found'})
+                continue
+            job_args = argparse.Namespace(**{**vars(args), **job})
+            try:
+                process_folder(path, job_args, workers, cache, metrics, limits, client, duplicate_index, stamper,
+                               on_result=lambda record: writer.write({'job': number, **record}))
+            except Exception as e:
+                logging.error(f"Job {number}: error processing {path}: {e}")
+                writer.write({'job': number, 'path': path, 'status': 'error', 'error': str(e)})
+    except OSError as e:
+        logging.error(f"Cannot read jobs from {args.batch}: {e}")
+        writer.close()
+        return EXIT_USAGE
+    return writer.close()
+
+
 def main():
     args = parse_args()
     setup_logging(args.verbose)
-    
-    print("\nPDF Rename Tool\n")
-    print("===============")
-    
-    if args.dry_run:
-        print("Running in DRY RUN mode - no files will be renamed")
-    
-    # If folder is provided as argument, process it directly
-    if args.folder:
-        folder_path = args.folder
-    else:
-        # Interactive mode
-        print("Type 'exit' to quit the program.")
-        print("===============\n")
-        folder_path = input("Folder Path: ")
-    
-    while folder_path.lower() != 'exit':
-        pdf_files = list_pdf_files(folder_path, args.recursive)
-        
-        if not pdf_files:
-            logging.warning(f"No PDF files found in {folder_path}")
-        else:
-            logging.info(f"Found {len(pdf_files)} PDF files")
-            
-            success_count = 0
-            for i, pdf_path in enumerate(pdf_files, 1):
-                logging.info(f"Processing file {i}/{len(pdf_files)}: {pdf_path}")
-                success, _ = process_pdf(
-                    pdf_path, 
-                    args.keywords,
-                    args.format,
-                    args.dry_run
-                )
-                if success:
-                    success_count += 1
-            
-            logging.info(f"Successfully processed {success_count} out of {len(pdf_files)} files")
-        
-        # Only ask for new input in interactive mode
-        if not args.folder:
-            folder_path = input("Folder Path: ")
+
+    # In batch mode stdout only carries the results
+    if not args.batch:
+        print("\nPDF Rename Tool\n")
+        print("===============")
+
+        if args.dry_run:
+            print("Running in DRY RUN mode - no files will be renamed")
+
+    if args.undo:
+        undone, failed = undo_journal(args.undo, args.dry_run)
+        logging.info(f"Undid {undone} renames, {failed} failed")
+        return
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    stamper = None
+    if args.set_dates:
+        try:
+            stamper = DateStamper(args.date_backend, args.dry_run)
+        except ValueError as e:
+            logging.error(str(e))
+            return
+
+    cache = None
+    if args.cache:
+        cache = ExtractionCache(args.cache, args.keywords, args.cache_max_entries, args.cache_hash,
+                                settings=f"{args.text_mode}:{not args.all_pages}:{','.join(args.strategy)}")
+        if args.cache_clear:
+            cache.clear()
+
+    metrics = MetricsReport(args.metrics_out) if args.profile or args.metrics_out else None
+
+    limits = None
+    if args.timeout or args.max_memory or args.max_size or args.max_pages:
+        limits = ResourceLimits(
+            timeout=args.timeout,
+            max_memory=args.max_memory * 1024 * 1024 if args.max_memory else None,
+            max_size=args.max_size * 1024 * 1024 if args.max_size else None,
+            max_pages=args.max_pages,
+        )
+
+    if args.serve:
+        try:
+            serve(args.serve, args.keywords, workers, cache, text_mode=args.text_mode,
+                  early_stop=not args.all_pages, strategy=args.strategy, limits=limits)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    duplicate_index = DuplicateIndex(args.duplicate_index) if args.duplicates else None
+
+    client = None
+    if args.server:
+        try:
+            client = ExtractionClient(args.server)
+        except OSError as e:
+            logging.warning(f"Extraction server at {args.server} not reachable ({e}), extracting locally")
+
+    exit_code = 0
+    try:
+        if args.batch:
+            exit_code = run_batch(args, workers, cache, metrics, limits, client, duplicate_index, stamper)
         else:
-            break
+            # If folder is provided as argument, process it directly
+            if args.folder:
+                folder_path = args.folder
+            else:
+                # Interactive mode
+                print("Type 'exit' to quit the program.")
+                print("===============\n")
+                folder_path = input("Folder Path: ")
+
+            while folder_path.lower() != 'exit':
+                process_folder(folder_path, args, workers, cache, metrics, limits, client, duplicate_index, stamper)
+
+                # Only ask for new input in interactive mode
+                if not args.folder:
+                    folder_path = input("Folder Path: ")
+                else:
+                    break
+    finally:
+        if cache is not None:
+            cache.close()
+        if client is not None:
+            client.close()
+        if duplicate_index is not None:
+            duplicate_index.close()
+        if metrics is not None:
+            metrics.log_summary(metrics.close())
+    if exit_code:
+        raise SystemExit(exit_code)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,70 @@
+import os
+import sys
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The tools are scripts that import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection reuse can be observed
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        data = server.files.get(self.path.split('?', 1)[0])
+        if data is None:
+            self.send_error(404)
+            return
+        header = self.headers.get('Range')
+        with server.lock:
+            server.requests.append((self.path, header))
+        if header is None or not server.ranges:
+            self.send_response(200)
+            start, end = 0, len(data) - 1
+        else:
+            start, _, end = header.split('=', 1)[1].partition('-')
+            start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        with server.lock:
+            cut = server.cut_after.pop(start, None)
+        if cut is not None:
+            # Send part of the body, then drop the connection
+            self.wfile.write(data[start:start + cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(data[start:end + 1])
+
+
+@pytest.fixture
+def range_server():
+    """Local HTTP server for downloads, serving `files` (path -> bytes) with Range support.
+
+    `requests` lists (path, Range header) of every request. A response whose
+    range starts at a byte in `cut_after` is cut off after that many bytes,
+    once. With `ranges` False the Range header is ignored.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _RangeHandler)
+    server.daemon_threads = True
+    server.files = {'/file': random.Random(0).randbytes(1024 * 1024)}
+    server.requests = []
+    server.cut_after = {}
+    server.ranges = True
+    server.lock = threading.Lock()
+    server.base_url = f'http://127.0.0.1:{server.server_port}'
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
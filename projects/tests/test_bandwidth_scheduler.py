@@ -0,0 +1,103 @@
+"""BandwidthScheduler rate and fairness, and rate-limited downloads over the shared connection pool."""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('pytubefix')
+pytest.importorskip('pydub')
+
+from ytVideoDownloader import BandwidthScheduler, ConnectionPool, SegmentedDownloader  # noqa: E402
+
+RATE = 2_000_000
+CHUNK = 32 * 1024
+
+
+def test_rate_is_limited_after_the_burst():
+    scheduler = BandwidthScheduler(RATE, burst=200_000)
+    download = scheduler.register()
+
+    started = time.monotonic()
+    for _ in range(1_000_000 // CHUNK):
+        scheduler.consume(download, CHUNK)
+    elapsed = time.monotonic() - started
+
+    # The burst is free, the rest arrives at the rate
+    expected = (1_000_000 // CHUNK * CHUNK - 200_000) / RATE
+    assert expected * 0.9 <= elapsed <= expected + 0.5
+
+
+def test_downloads_share_equally_whatever_their_connections():
+    scheduler = BandwidthScheduler(RATE, burst=CHUNK)
+    received = {}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def connection(download):
+        while not stop.is_set():
+            scheduler.consume(download, CHUNK)
+            with lock:
+                received[download] = received.get(download, 0) + CHUNK
+
+    wide, narrow = scheduler.register(), scheduler.register()
+    threads = [threading.Thread(target=connection, args=(wide,)) for _ in range(4)]
+    threads.append(threading.Thread(target=connection, args=(narrow,)))
+    for thread in threads:
+        thread.start()
+    time.sleep(1)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert 0.75 <= received[wide] / received[narrow] <= 1.33
+    # Together they stay at the rate
+    assert sum(received.values()) <= RATE * 1.5
+
+
+def test_stats_without_a_rate():
+    now = [100.0]
+    scheduler = BandwidthScheduler(clock=lambda: now[0])
+    first, second = scheduler.register(), scheduler.register()
+    scheduler.consume(first, 3000)
+    scheduler.consume(second, 1000)
+    now[0] += 2
+
+    stats = scheduler.stats()
+    assert stats['bytes'] == 4000
+    assert stats['throughput'] == pytest.approx(2000)
+    assert stats['active'] == 2
+    assert stats['waiting'] == 0
+
+    scheduler.unregister(first)
+    now[0] += BandwidthScheduler.WINDOW + 1
+    assert scheduler.stats()['active'] == 1
+    assert scheduler.stats()['throughput'] == 0
+
+
+def test_rate_limited_download_over_shared_pool(range_server, tmp_path):
+    data = range_server.files['/file']
+    pool = ConnectionPool()
+    downloader = SegmentedDownloader(connections=4, segment_size=128 * 1024, chunk_size=CHUNK, pool=pool,
+                                     scheduler=BandwidthScheduler(RATE, burst=128 * 1024))
+
+    started = time.monotonic()
+    path = downloader.download(range_server.base_url + '/file', str(tmp_path / 'video.mp4'), len(data))
+    elapsed = time.monotonic() - started
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert elapsed >= (len(data) - 128 * 1024) / RATE * 0.9
+    # Eight segments over at most four keep-alive connections
+    assert pool.created <= 4
+    assert pool.created + pool.reused == 8
+    pool.close()
+
+
+def test_idle_connections_expire():
+    pool = ConnectionPool(idle_timeout=0)
+    parts = type('Parts', (), {'scheme': 'http', 'hostname': '127.0.0.1', 'port': 1})()
+    conn = pool.acquire(parts)
+    pool.release(conn)
+
+    assert pool.acquire(parts) is not conn
+    assert (pool.created, pool.reused) == (2, 0)
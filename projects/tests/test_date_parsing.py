@@ -0,0 +1,97 @@
+"""Regression corpus for the date scanner and the direct parser of numeric dates."""
+import re
+import datetime
+import importlib.util
+
+import pytest
+
+from pdfRename import DATE_PATTERNS, extract_date, find_date_string, parse_date
+
+requires_dateparser = pytest.mark.skipif(importlib.util.find_spec('dateparser') is None,
+                                         reason='dateparser is not installed')
+
+# (text, filename, expected date)
+CORPUS = [
+    ('Musterstadt, 05.03.2021', None, datetime.datetime(2021, 3, 5)),
+    ('Rechnung vom 5.3.2021 über 12,50 EUR', None, datetime.datetime(2021, 3, 5)),
+    ('Stand: 2021-03-05', None, datetime.datetime(2021, 3, 5)),
+    ('Stand: 2021-3-5', None, datetime.datetime(2021, 3, 5)),
+    ('Eingang 05/03/2021', None, datetime.datetime(2021, 3, 5)),
+    ('Zahlbar bis 29.02.2024', None, datetime.datetime(2024, 2, 29)),
+    # Labelled dates win over dates earlier in the text
+    # A label only counts with the date right behind it
+    ('Frist: 01.01.2020\nOrt, Datum: Musterstadt 02.02.2021', None, datetime.datetime(2020, 1, 1)),
+    ('Frist: 01.01.2020\nOrt, Datum: 02.02.2021', None, datetime.datetime(2021, 2, 2)),
+    ('Gültig bis 31.12.2022\nDatum, Ort: 15.06.2022 Musterstadt', None, datetime.datetime(2022, 6, 15)),
+    ('Aktenzeichen 2019-04-01\nUnterschrift 03.07.2020', None, datetime.datetime(2020, 7, 3)),
+    ('Unterschriften: 3.7.2020', None, datetime.datetime(2020, 7, 3)),
+    # DD.MM.YYYY is preferred over the later ranked formats anywhere in the text
+    ('Stand 2019-04-01, Bescheid vom 11.11.2019', None, datetime.datetime(2019, 11, 11)),
+    ('Eingang 04/05/2018 und 2018-05-06', None, datetime.datetime(2018, 5, 6)),
+    ('Kein Datum hier, nur 12345 und 1.2.', None, None),
+    ('Version 1.2.20190', None, None),
+    # Filename fallbacks
+    ('', '20230415_scan.pdf', datetime.datetime(2023, 4, 15)),
+    ('', '/archiv/20230415_scan.pdf', datetime.datetime(2023, 4, 15)),
+    ('', 'scan_2023-04-16.pdf', datetime.datetime(2023, 4, 16)),
+    ('kein Datum', '2023-04-16 Brief.pdf', datetime.datetime(2023, 4, 16)),
+    ('', 'scan.pdf', None),
+    ('Datum folgt', None, None),
+    # Month names go through dateparser
+    pytest.param('Musterstadt, 1. März 2020', None, datetime.datetime(2020, 3, 1), marks=requires_dateparser),
+    pytest.param('Berlin, den 24. Dezember 2019', None, datetime.datetime(2019, 12, 24), marks=requires_dateparser),
+    pytest.param('Ort, Datum: 7. Juli 2021', None, datetime.datetime(2021, 7, 7), marks=requires_dateparser),
+    pytest.param('Datum, Ort: 07.07.2021, Stand 1. März 2020', None, datetime.datetime(2021, 7, 7),
+                 marks=requires_dateparser),
+    pytest.param('', 'scan_16.04.2023.pdf', datetime.datetime(2023, 4, 16), marks=requires_dateparser),
+]
+
+
+def findall_date_string(text):
+    # The scan as it was before DATE_SCANNER: the first match of the first pattern that matches
+    for pattern in DATE_PATTERNS:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        if matches:
+            return matches[0]
+    return None
+
+
+@pytest.mark.parametrize('text, filename, expected', CORPUS)
+def test_extract_date(text, filename, expected):
+    assert extract_date(text, filename) == expected
+
+
+@pytest.mark.parametrize('text', [getattr(case, 'values', case)[0] for case in CORPUS])
+def test_scanner_matches_findall(text):
+    assert find_date_string(text) == findall_date_string(text)
+
+
+def numeric_date_strings(years=(1999, 2020, 2024), months=(1, 2, 9, 10, 12, 13),
+                         days=(1, 9, 10, 12, 13, 28, 29, 30, 31, 32)):
+    for year in years:
+        for month in months:
+            for day in days:
+                yield f"{day}.{month}.{year}"
+                yield f"{day:02d}.{month:02d}.{year}"
+                yield f"{year}-{month:02d}-{day:02d}"
+                yield f"{day:02d}/{month:02d}/{year}"
+
+
+@requires_dateparser
+def test_numeric_dates_match_dateparser():
+    import dateparser
+    mismatches = []
+    for date_str in numeric_date_strings():
+        expected = dateparser.parse(date_str, languages=['de'])
+        if parse_date(date_str, languages=('de',)) != expected:
+            mismatches.append((date_str, expected))
+    assert mismatches == []
+
+
+@requires_dateparser
+def test_iso_dates_without_language_match_dateparser():
+    # The YYYYMMDD_ filename prefix is parsed without a language, which makes dateparser slow
+    import dateparser
+    for date_str in numeric_date_strings(years=(2024,), months=(1, 2, 12, 13), days=(1, 12, 13, 29, 30, 31, 32)):
+        if '-' in date_str:
+            assert parse_date(date_str, languages=None) == dateparser.parse(date_str), date_str
@@ -0,0 +1,138 @@
+"""DuplicateIndex's size, partial hash and full hash chain and the --duplicates policies."""
+import datetime
+import os
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import pdfRename
+from pdfRename import DEFAULT_STRATEGY, DuplicateIndex, ExtractionCache, process_folder
+
+SIZE = 3 * DuplicateIndex.PARTIAL_BYTES
+
+
+def pdf_bytes(seed, size=SIZE):
+    return b'%PDF-1.4\n' + random.Random(seed).randbytes(size - 9)
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """Replace the PDF extraction by a lookup of the first bytes; lists the extracted paths."""
+    paths = []
+
+    def analyze_pdf(pdf_path, keywords_file, name_format="{date}_{title}", **options):
+        paths.append(pdf_path)
+        with open(pdf_path, 'rb') as file:
+            day = file.read(16)[-1] % 28 + 1
+        result = pdfRename._analysis_result(pdf_path, datetime.datetime(2023, 1, day), 'Rechnung', name_format)
+        result['resolved_by'] = 'content'
+        return result
+
+    monkeypatch.setattr(pdfRename, 'analyze_pdf', analyze_pdf)
+    return paths
+
+
+def run(folder, policy, dry_run=False, index=None):
+    args = SimpleNamespace(recursive=False, exclude=[], dry_run=dry_run, journal=None, keywords='',
+                           format='{date}_{title}', text_mode='layout', all_pages=False, strategy=DEFAULT_STRATEGY,
+                           duplicates=policy, quarantine=None)
+    records = []
+    index = index or DuplicateIndex()
+    try:
+        process_folder(str(folder), args, duplicate_index=index, on_result=records.append)
+    finally:
+        index.close()
+    return {os.path.basename(record['path']): record for record in records}
+
+
+def test_equal_size_is_not_a_duplicate(tmp_path):
+    original = pdf_bytes(1)
+    # Same head and tail, so only the full hash tells them apart
+    middle = original[:SIZE // 2] + b'x' + original[SIZE // 2 + 1:]
+    (tmp_path / 'a.pdf').write_bytes(original)
+    (tmp_path / 'b.pdf').write_bytes(pdf_bytes(2))
+    (tmp_path / 'c.pdf').write_bytes(middle)
+    (tmp_path / 'd.pdf').write_bytes(original)
+    index = DuplicateIndex()
+
+    assert [index.check(str(tmp_path / name)) for name in ('a.pdf', 'b.pdf', 'c.pdf', 'd.pdf')] == [
+        None, None, None, str(tmp_path / 'a.pdf')
+    ]
+    index.close()
+
+
+@pytest.mark.parametrize('policy', ['report', 'hardlink'])
+def test_copies_reuse_the_original_result(tmp_path, extracted, policy):
+    (tmp_path / 'a.pdf').write_bytes(pdf_bytes(1))
+    (tmp_path / 'b.pdf').write_bytes(pdf_bytes(1))
+    (tmp_path / 'c.pdf').write_bytes(pdf_bytes(2))
+
+    records = run(tmp_path, policy, dry_run=True)
+
+    assert sorted(os.path.basename(path) for path in extracted) == ['a.pdf', 'c.pdf']
+    assert records['b.pdf']['duplicate_of'] == str(tmp_path / 'a.pdf')
+    assert records['b.pdf']['resolved_by'] == 'duplicate'
+    assert (records['b.pdf']['date'], records['b.pdf']['title']) == (records['a.pdf']['date'], 'Rechnung')
+    assert records['b.pdf']['status'] == 'would_rename'
+
+
+def test_skip_leaves_copies_alone(tmp_path, extracted):
+    (tmp_path / 'a.pdf').write_bytes(pdf_bytes(1))
+    (tmp_path / 'b.pdf').write_bytes(pdf_bytes(1))
+
+    records = run(tmp_path, 'skip')
+
+    assert [os.path.basename(path) for path in extracted] == ['a.pdf']
+    assert records['b.pdf']['status'] == 'skipped'
+    assert (tmp_path / 'b.pdf').exists()
+
+
+def test_hardlink_shares_the_inode(tmp_path, extracted):
+    (tmp_path / 'a.pdf').write_bytes(pdf_bytes(1))
+    (tmp_path / 'b.pdf').write_bytes(pdf_bytes(1))
+
+    records = run(tmp_path, 'hardlink')
+
+    new_a, new_b = records['a.pdf']['new_path'], records['b.pdf']['new_path']
+    assert new_a != new_b
+    assert os.stat(new_a).st_ino == os.stat(new_b).st_ino
+    assert os.stat(new_a).st_nlink == 2
+
+
+def test_index_database_is_reused(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'duplicates.db')
+    archive = tmp_path / 'archive'
+    archive.mkdir()
+    for name in ('a.pdf', 'b.pdf'):
+        (archive / name).write_bytes(pdf_bytes(1))
+    index = DuplicateIndex(db_path)
+    assert index.check(str(archive / 'a.pdf')) is None
+    assert index.check(str(archive / 'b.pdf')) == str(archive / 'a.pdf')
+    index.close()
+
+    def not_again(*args):
+        raise AssertionError('hashed a file the index already knows')
+
+    monkeypatch.setattr(DuplicateIndex, 'partial_hash', classmethod(not_again))
+    monkeypatch.setattr(ExtractionCache, 'content_hash', staticmethod(not_again))
+    index = DuplicateIndex(db_path)
+    assert index.check(str(archive / 'a.pdf')) is None
+    assert index.check(str(archive / 'b.pdf')) == str(archive / 'a.pdf')
+    index.close()
+
+
+def test_second_run_finds_copies_of_renamed_originals(tmp_path, extracted):
+    db_path = str(tmp_path / 'duplicates.db')
+    archive = tmp_path / 'archive'
+    archive.mkdir()
+    (archive / 'a.pdf').write_bytes(pdf_bytes(1))
+    renamed = run(archive, 'report', index=DuplicateIndex(db_path))['a.pdf']['new_path']
+
+    (archive / 'z.pdf').write_bytes(pdf_bytes(1))
+    records = run(archive, 'report', index=DuplicateIndex(db_path))
+
+    # Indexed by the first run under its old name and followed through the rename
+    assert records['z.pdf']['duplicate_of'] == renamed
+    assert records['z.pdf']['resolved_by'] == 'duplicate'
+    assert extracted == [str(archive / 'a.pdf'), renamed]
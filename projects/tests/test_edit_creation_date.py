@@ -0,0 +1,101 @@
+"""editCreationDate's batch logic, driven through the in-memory FakeBackend."""
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('tqdm')
+
+from editCreationDate import FAILED, UNCHANGED, UPDATED, FakeBackend, _timestamp_ns, process_folder  # noqa: E402
+
+
+def stat_at(date_time):
+    return SimpleNamespace(st_atime_ns=0, st_mtime_ns=_timestamp_ns(date_time), st_ctime=0)
+
+
+def make_files(folder, names):
+    paths = []
+    for name in names:
+        path = folder / name
+        path.write_bytes(b'%PDF-1.4\n')
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Three files with stale dates, one already correct and two without a usable date."""
+    stale = make_files(tmp_path, ['20230105_Rechnung.pdf', '2022-11-30_Brief.pdf', 'scan_20210704.pdf'])
+    current, = make_files(tmp_path, ['20200202_Bescheid.pdf'])
+    undated = make_files(tmp_path, ['scan.pdf', '20231340_Ungueltig.pdf'])
+    stats = {path: stat_at(datetime.datetime(2000, 1, 1)) for path in stale}
+    stats[current] = stat_at(datetime.datetime(2020, 2, 2))
+    return SimpleNamespace(folder=tmp_path, stale=stale, current=current, undated=undated, stats=stats)
+
+
+def run(folder, backend, **options):
+    records = []
+    counts = process_folder(str(folder), backend=backend, on_result=records.append, **options)
+    return counts, {record['path']: record['status'] for record in records}
+
+
+@pytest.mark.parametrize('threads', [1, 4])
+def test_counts_and_writes(archive, threads):
+    backend = FakeBackend(stats=archive.stats)
+    counts, statuses = run(archive.folder, backend, threads=threads)
+
+    assert counts == (3, 2, 1)
+    assert sorted(backend.writes) == sorted([
+        (archive.stale[0], datetime.datetime(2023, 1, 5)),
+        (archive.stale[1], datetime.datetime(2022, 11, 30)),
+        (archive.stale[2], datetime.datetime(2021, 7, 4)),
+    ])
+    assert statuses == {**dict.fromkeys(archive.stale, UPDATED), archive.current: UNCHANGED,
+                        **dict.fromkeys(archive.undated, FAILED)}
+
+
+def test_second_run_is_idempotent(archive):
+    backend = FakeBackend(stats=archive.stats)
+    run(archive.folder, backend)
+    writes = list(backend.writes)
+
+    counts, statuses = run(archive.folder, backend)
+
+    assert counts == (0, 2, 4)
+    assert backend.writes == writes
+    assert {path for path, status in statuses.items() if status == UNCHANGED} == {*archive.stale, archive.current}
+
+
+def test_dry_run_writes_nothing(archive):
+    backend = FakeBackend(stats=archive.stats)
+    counts, statuses = run(archive.folder, backend, dry_run=True)
+
+    assert counts == (3, 2, 1)
+    assert backend.writes == []
+    assert all(statuses[path] == 'would_update' for path in archive.stale)
+
+
+def test_failed_write(archive):
+    class FailingBackend(FakeBackend):
+        def apply(self, filepath, date_time, stat, dir_fd=None):
+            if filepath == archive.stale[0]:
+                raise OSError('read-only file system')
+            super().apply(filepath, date_time, stat, dir_fd)
+
+    backend = FailingBackend(stats=archive.stats)
+    counts, statuses = run(archive.folder, backend, threads=4)
+
+    assert counts == (2, 3, 1)
+    assert statuses[archive.stale[0]] == FAILED
+    assert archive.stale[0] not in [path for path, _ in backend.writes]
+
+
+def test_pool_drains_every_write(tmp_path):
+    # More files than the bounded window of threads * 4 pending writes
+    paths = make_files(tmp_path, [f'2023{month:02d}{day:02d}_Beleg.pdf' for month in (1, 2) for day in range(1, 26)])
+    backend = FakeBackend()
+    counts, statuses = run(tmp_path, backend, threads=2)
+
+    assert counts == (50, 0, 0)
+    assert sorted(path for path, _ in backend.writes) == sorted(paths)
+    assert set(statuses.values()) == {UPDATED}
@@ -0,0 +1,57 @@
+"""ExtractionClient against a stand-in server on a Unix socket."""
+import json
+import socket
+import socketserver
+import threading
+
+import pytest
+
+from pdfRename import ExtractionClient, _analysis_result
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='needs Unix domain sockets')
+
+
+class _ShortHandler(socketserver.StreamRequestHandler):
+    # Answers every request with one result too few, like a server that died partway
+
+    def handle(self):
+        for line in self.rfile:
+            paths = json.loads(line)['paths']
+            results = [_analysis_result(path, None, 'Server', '') for path in paths[:-1]]
+            self.wfile.write(json.dumps({'results': results}).encode('utf-8') + b'\n')
+
+
+@pytest.fixture
+def short_server(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    server = socketserver.UnixStreamServer(path, _ShortHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def test_incomplete_answer_raises(short_server):
+    client = ExtractionClient(short_server)
+    try:
+        with pytest.raises(ConnectionError, match='answered 1 of 2 files'):
+            client.analyze(['a.pdf', 'b.pdf'])
+    finally:
+        client.close()
+
+
+def test_incomplete_answer_falls_back_for_the_whole_batch(short_server):
+    client = ExtractionClient(short_server, batch_size=2)
+    fallen_back = []
+
+    def fallback(files):
+        for path in files:
+            fallen_back.append(path)
+            yield _analysis_result(path, None, 'Local', '')
+
+    results = list(client.iter_analyses(['a.pdf', 'b.pdf', 'c.pdf'], fallback=fallback))
+
+    assert [result['path'] for result in results] == ['a.pdf', 'b.pdf', 'c.pdf']
+    assert fallen_back == ['a.pdf', 'b.pdf', 'c.pdf']
+    assert not client.connected
@@ -0,0 +1,128 @@
+"""TTLCache, metadata prefetching and the deduplicated lookups of YouTubeDownloader.resolve()."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('pytubefix')
+pytest.importorskip('pydub')
+
+from ytVideoDownloader import MetadataPrefetcher, TTLCache, YouTubeDownloader  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ManifestSource:
+    """Stand-in for pytubefix.YouTube that counts and slows down the lookups."""
+
+    def __init__(self, delay=0.0, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.lookups = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url, on_progress_callback=None):
+        with self.lock:
+            self.lookups.append(url)
+        time.sleep(self.delay)
+        if url in self.failing:
+            raise ConnectionError(f'lookup of {url} failed')
+        return type('Manifest', (), {'title': 'Title of ' + url, 'streams': ['stream of ' + url]})()
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl=60, clock=clock)
+    cache.put('a', 1)
+
+    clock.now += 59.9
+    assert cache.get('a') == 1
+    clock.now += 0.1
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_put_restarts_the_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl=60, clock=clock)
+    cache.put('a', 1)
+    clock.now += 50
+    cache.put('a', 2)
+    clock.now += 50
+
+    assert cache.get('a') == 2
+
+
+def test_least_recently_used_entries_are_dropped():
+    cache = TTLCache(max_entries=2, clock=FakeClock())
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_concurrent_resolves_share_one_lookup(tmp_path):
+    source = ManifestSource(delay=0.2)
+    downloader = YouTubeDownloader(str(tmp_path), youtube_factory=source)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(downloader.resolve, ['url1'] * 8))
+
+    assert source.lookups == ['url1']
+    assert all(result is results[0] for result in results)
+    assert downloader.resolve('url1') is results[0]
+    assert source.lookups == ['url1']
+
+
+def test_resolve_looks_up_again_after_expiry(tmp_path):
+    clock = FakeClock()
+    source = ManifestSource()
+    downloader = YouTubeDownloader(str(tmp_path), youtube_factory=source,
+                                   manifest_cache=TTLCache(ttl=3600, clock=clock))
+    first = downloader.resolve('url1')
+
+    clock.now += 3600
+    assert downloader.resolve('url1') is not first
+    assert source.lookups == ['url1', 'url1']
+
+
+def test_failed_lookups_are_not_cached(tmp_path):
+    source = ManifestSource(failing={'url1'})
+    downloader = YouTubeDownloader(str(tmp_path), youtube_factory=source)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            downloader.resolve('url1')
+    assert source.lookups == ['url1', 'url1']
+
+
+def test_prefetcher_resolves_the_window_ahead(tmp_path):
+    source = ManifestSource(failing={'url2'})
+    downloader = YouTubeDownloader(str(tmp_path), youtube_factory=source)
+    urls = [f'url{index}' for index in range(10)]
+    prefetcher = MetadataPrefetcher(downloader.resolve, urls, window=3)
+
+    prefetcher.advance(0)
+    prefetcher.advance(2)
+    # close() drops the lookups that have not started yet
+    deadline = time.monotonic() + 5
+    while len(source.lookups) < 6 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    prefetcher.close()
+
+    # Up to index + window, each URL once; the failed lookup is left to the download
+    assert sorted(source.lookups) == urls[:6]
+    assert downloader.manifest_cache.get('url5') is not None
+    assert downloader.manifest_cache.get('url2') is None
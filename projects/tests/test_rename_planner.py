@@ -0,0 +1,94 @@
+"""RenamePlanner's in-memory collision handling and the rename journal."""
+import os
+
+from pdfRename import RenamePlanner, rename_pdf, undo_journal
+
+SOURCES = ['scan_a.pdf', 'scan_b.pdf', 'scan_c.pdf', 'scan_d.pdf']
+
+
+def make_folder(folder, names):
+    folder.mkdir()
+    for name in names:
+        (folder / name).write_bytes(name.encode())
+    return folder
+
+
+def contents(folder):
+    return {path.name: path.read_bytes() for path in folder.iterdir() if path.suffix == '.pdf'}
+
+
+def plan(folder, targets, **options):
+    planner = RenamePlanner(**options)
+    planned = {name: planner.assign(str(folder / name), target) for name, target in targets.items()}
+    return planner, planned
+
+
+def test_same_suffixes_as_rename_pdf(tmp_path):
+    # Taken names, with a gap at _1 and _3
+    existing = ['20230105_Rechnung.pdf', '20230105_Rechnung_2.pdf', 'other.pdf']
+    targets = dict.fromkeys(SOURCES, '20230105_Rechnung.pdf')
+    old = make_folder(tmp_path / 'old', SOURCES + existing)
+    new = make_folder(tmp_path / 'new', SOURCES + existing)
+
+    for name, target in targets.items():
+        rename_pdf(str(old / name), target)
+    planner, planned = plan(new, targets)
+    assert planner.apply() == len(SOURCES)
+
+    assert contents(new) == contents(old)
+    assert [os.path.basename(path) for path in planned.values()] == [
+        '20230105_Rechnung_1.pdf', '20230105_Rechnung_3.pdf', '20230105_Rechnung_4.pdf', '20230105_Rechnung_5.pdf'
+    ]
+
+
+def test_file_with_its_final_or_counter_name_is_unchanged(tmp_path):
+    folder = make_folder(tmp_path / 'archive', ['20230105_Rechnung.pdf', '20230105_Rechnung_1.pdf'])
+    before = contents(folder)
+
+    planner, planned = plan(folder, dict.fromkeys(['20230105_Rechnung.pdf', '20230105_Rechnung_1.pdf'],
+                                                  '20230105_Rechnung.pdf'))
+
+    assert planned == {name: str(folder / name) for name in planned}
+    assert planner.planned == []
+    assert planner.apply() == 0
+    assert contents(folder) == before
+
+
+def test_dry_run_does_not_touch_the_disk(tmp_path):
+    folder = make_folder(tmp_path / 'archive', SOURCES)
+    before = contents(folder)
+    applied = []
+
+    planner, planned = plan(folder, dict.fromkeys(SOURCES, '20230105_Rechnung.pdf'), dry_run=True)
+    renamed = planner.apply(lambda old, new, error: applied.append((old, new, error)))
+
+    assert renamed == 0
+    assert contents(folder) == before
+    assert applied == [(str(folder / name), planned[name], None) for name in SOURCES]
+    assert len(set(planned.values())) == len(SOURCES)
+
+
+def test_undo_restores_the_original_names(tmp_path):
+    folder = make_folder(tmp_path / 'archive', SOURCES)
+    before = contents(folder)
+    journal = str(tmp_path / 'renames.jsonl')
+
+    planner, _ = plan(folder, dict.fromkeys(SOURCES, '20230105_Rechnung.pdf'), journal_path=journal)
+    planner.apply()
+    assert contents(folder) != before
+
+    assert undo_journal(journal) == (len(SOURCES), 0)
+    assert contents(folder) == before
+    # Entries already undone are not undone again
+    assert undo_journal(journal) == (0, 0)
+
+
+def test_undo_skips_missing_targets(tmp_path):
+    folder = make_folder(tmp_path / 'archive', SOURCES)
+    journal = str(tmp_path / 'renames.jsonl')
+    planner, planned = plan(folder, dict.fromkeys(SOURCES, '20230105_Rechnung.pdf'), journal_path=journal)
+    planner.apply()
+    os.remove(planned['scan_b.pdf'])
+
+    assert undo_journal(journal) == (len(SOURCES) - 1, 1)
+    assert sorted(contents(folder)) == sorted(set(SOURCES) - {'scan_b.pdf'})
@@ -0,0 +1,135 @@
+"""SegmentedDownloader against a local range-capable HTTP server."""
+import json
+import os
+
+import pytest
+
+pytest.importorskip('pytubefix')
+pytest.importorskip('pydub')
+
+from ytVideoDownloader import DownloadError, SegmentedDownloader  # noqa: E402
+
+SEGMENT = 128 * 1024
+
+
+def requested_ranges(server):
+    return [header for _, header in server.requests if header != 'bytes=0-0']
+
+
+def test_download_in_segments(range_server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    progress = []
+    downloader = SegmentedDownloader(connections=4, segment_size=SEGMENT, chunk_size=16 * 1024)
+
+    assert downloader.download(range_server.base_url + '/file', path, on_progress=progress.append) == path
+
+    data = range_server.files['/file']
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert sum(progress) == len(data)
+    assert sorted(requested_ranges(range_server)) == sorted(
+        f'bytes={start}-{start + SEGMENT - 1}' for start in range(0, len(data), SEGMENT)
+    )
+    assert not os.path.exists(path + '.part')
+    assert not os.path.exists(path + '.part.json')
+
+
+def test_resume_fetches_only_missing_segments(range_server, tmp_path):
+    data = range_server.files['/file']
+    path = str(tmp_path / 'video.mp4')
+    # An earlier attempt finished the first half
+    with open(path + '.part', 'wb') as f:
+        f.write(data[:len(data) // 2] + bytes(len(data) // 2))
+    with open(path + '.part.json', 'w') as f:
+        json.dump({'size': len(data), 'segment_size': SEGMENT, 'done': [0, 1, 2, 3]}, f)
+    progress = []
+
+    SegmentedDownloader(connections=2, segment_size=SEGMENT).download(
+        range_server.base_url + '/file', path, len(data), progress.append
+    )
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert progress[0] == 4 * SEGMENT
+    assert sorted(requested_ranges(range_server)) == sorted(
+        f'bytes={start}-{start + SEGMENT - 1}' for start in range(4 * SEGMENT, len(data), SEGMENT)
+    )
+
+
+@pytest.mark.parametrize('state', [
+    {'size': 1024 * 1024, 'segment_size': SEGMENT * 2, 'done': [0, 1]},
+    {'size': 1000, 'segment_size': SEGMENT, 'done': [0, 1]},
+    'not json',
+])
+def test_state_of_another_download_is_ignored(range_server, tmp_path, state):
+    data = range_server.files['/file']
+    path = str(tmp_path / 'video.mp4')
+    with open(path + '.part', 'wb') as f:
+        f.write(bytes(len(data)))
+    with open(path + '.part.json', 'w') as f:
+        f.write(state if isinstance(state, str) else json.dumps(state))
+
+    SegmentedDownloader(connections=4, segment_size=SEGMENT).download(range_server.base_url + '/file', path,
+                                                                      len(data))
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert len(requested_ranges(range_server)) == len(data) // SEGMENT
+
+
+def test_state_without_part_file_is_ignored(range_server, tmp_path):
+    data = range_server.files['/file']
+    path = str(tmp_path / 'video.mp4')
+    with open(path + '.part.json', 'w') as f:
+        json.dump({'size': len(data), 'segment_size': SEGMENT, 'done': list(range(8))}, f)
+
+    SegmentedDownloader(connections=4, segment_size=SEGMENT).download(range_server.base_url + '/file', path,
+                                                                      len(data))
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_broken_range_continues_from_last_byte(range_server, tmp_path):
+    data = range_server.files['/file']
+    path = str(tmp_path / 'video.mp4')
+    range_server.cut_after[SEGMENT] = 10000
+
+    SegmentedDownloader(connections=2, segment_size=SEGMENT, chunk_size=4096).download(
+        range_server.base_url + '/file', path, len(data)
+    )
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    ranges = requested_ranges(range_server)
+    assert f'bytes={SEGMENT}-{2 * SEGMENT - 1}' in ranges
+    # The retry asks for the rest of the segment only, from a chunk boundary after the cut
+    retries = [header for header in ranges
+               if header.endswith(f'-{2 * SEGMENT - 1}') and header != f'bytes={SEGMENT}-{2 * SEGMENT - 1}']
+    assert len(retries) == 1
+    assert SEGMENT < int(retries[0][len('bytes='):].split('-')[0]) <= SEGMENT + 10000
+
+
+def test_size_is_asked_for_when_unknown(range_server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+
+    SegmentedDownloader(connections=4, segment_size=SEGMENT).download(range_server.base_url + '/file', path)
+
+    assert os.path.getsize(path) == len(range_server.files['/file'])
+    assert range_server.requests[0][1] == 'bytes=0-0'
+
+
+def test_server_without_range_support(range_server, tmp_path):
+    range_server.ranges = False
+    downloader = SegmentedDownloader(connections=4, segment_size=SEGMENT, retries=1)
+
+    with pytest.raises(DownloadError):
+        downloader.download(range_server.base_url + '/file', str(tmp_path / 'video.mp4'))
+
+
+def test_iter_chunks_yields_content_in_order(range_server):
+    data = range_server.files['/file']
+    downloader = SegmentedDownloader(connections=4, segment_size=SEGMENT, chunk_size=50000)
+
+    assert b''.join(downloader.iter_chunks(range_server.base_url + '/file', len(data))) == data
+    assert downloader.pool.reused > 0
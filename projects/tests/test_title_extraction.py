@@ -0,0 +1,94 @@
+"""Regression corpus for the compiled keyword matcher against the original per-keyword search."""
+import os
+import re
+
+import pytest
+
+from pdfRename import extract_title, load_keywords_from_file
+
+KEYWORDS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'components', 'keywords.txt')
+
+
+def baseline_extract_title(text, keywords):
+    # extract_title as it was before the keywords were compiled into one scanner
+    if not keywords:
+        return "Unknown"
+    sorted_keywords = sorted(keywords, key=len, reverse=True)
+    for keyword in sorted_keywords:
+        title_pattern = r'(?:[\w\d][^\n\r.]{0,30}\s+){0,5}' + re.escape(keyword) + r'(?:\s+[^\n\r.]{0,30}[\w\d]){0,5}'
+        title_match = re.search(title_pattern, text, re.IGNORECASE)
+        if title_match:
+            title = title_match.group(0).strip()
+            if len(title) > 80:
+                last_space = title[:80].rfind(' ')
+                if last_space > 40:
+                    title = title[:last_space]
+            title = re.sub(r'\s+', ' ', title)
+            title = title.replace('/', '_').replace('\\', '_')
+            title = title.replace(':', '_').replace(';', '_')
+            title = title.replace('"', '').replace("'", "")
+            title = title.replace(' ', '_')
+            return title
+        simple_pattern = r"\b{}\w*\b".format(keyword)
+        simple_match = re.search(simple_pattern, text, re.IGNORECASE)
+        if simple_match:
+            return simple_match.group(0).replace(" ", "_")
+    return "Unknown"
+
+
+CORPUS = [
+    'Musterstadt, 05.03.2021\nRechnung Nr. 2021-0042\nSehr geehrte Damen und Herren,',
+    'Ihre Stromrechnung für den Zeitraum 01/2021 bis 12/2021',
+    'KRANKENVERSICHERUNG\nBeitragsbescheinigung 2020 für Max Mustermann',
+    'bescheid über die Festsetzung der Einkommensteuer',
+    'Betreff: Kündigung des Mietvertrags zum 31.12.2022',
+    'Lohnsteuerbescheinigung; Arbeitgeber: "Muster GmbH"\\Personalabteilung',
+    'Termin beim Arzt am Montag',
+    'Sehr geehrte Frau Muster, anbei erhalten Sie das Angebot Nummer 17 für die Renovierung '
+    'der Wohnung im zweiten Obergeschoss sowie die Aufstellung aller Kosten und Leistungen im Detail',
+    'Versicherungsschein\r\nPolice 12345',
+    'Kontoauszug 3/2021 Seite 1 von 2. Alter Saldo 1.234,56 EUR',
+    'Hier steht nichts Passendes drin.',
+    '',
+    'a b c d e f g h Vertrag i j k l m n o p',
+    'Zahlungserinnerung zur Rechnung vom 01.02.2023. Bitte überweisen Sie',
+    'Das Attest;Arzt/Praxis Dr. Muster',
+]
+
+
+@pytest.mark.parametrize('text', CORPUS)
+def test_matches_baseline_with_shipped_keywords(text):
+    assert extract_title(text, KEYWORDS_FILE) == baseline_extract_title(text, load_keywords_from_file(KEYWORDS_FILE))
+
+
+def keywords_file(tmp_path, keywords):
+    path = tmp_path / 'keywords.txt'
+    path.write_text('\n'.join(keywords), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('keywords, text, expected', [
+    # Overlapping keywords: the longest one wins wherever it is
+    (['Rechnung', 'Stromrechnung'], 'Rechnung folgt. Ihre Stromrechnung 2021', 'Ihre_Stromrechnung_2021'),
+    (['Steuer', 'Steuerbescheid'], 'Steuer. Steuerbescheid', 'Steuerbescheid'),
+    # Case differences between keyword and text
+    (['mietvertrag'], 'MIETVERTRAG Wohnung 3', 'MIETVERTRAG_Wohnung_3'),
+    # Regex metacharacters are literal in the title pattern, but not in the simple fallback
+    (['Nr.'], 'Rechnung Nr. 42', 'Rechnung_Nr._42'),
+    (['Kosten (netto)'], 'Kosten (netto) gesamt', 'Kosten_(netto)_gesamt'),
+    (['a.c'], 'Rechnung abc', 'abc'),
+    (['Anlage+'], 'Anlageee B', 'Anlageee'),
+    # Cut at the last space before 80 characters
+    (['Angebot'],
+     'Wir senden Ihnen heute wie besprochen unser Angebot zur Renovierung der Wohnung im zweiten Obergeschoss',
+     'Wir_senden_Ihnen_heute_wie_besprochen_unser_Angebot_zur_Renovierung_der_Wohnung'),
+    # No title pattern match: the simple pattern extends the keyword to the end of the word
+    (['Beleg.'], 'Belegnummer 7', 'Belegnummer'),
+    # Empty keyword file
+    ([], 'Rechnung 2021', 'Unknown'),
+    (['Vertrag'], 'Nichts zu finden', 'Unknown'),
+])
+def test_matches_baseline(tmp_path, keywords, text, expected):
+    path = keywords_file(tmp_path, keywords)
+    assert baseline_extract_title(text, load_keywords_from_file(path)) == expected
+    assert extract_title(text, path) == expected
@@ -0,0 +1,170 @@
+"""YouTubeDownloader with stand-in YouTube and Playlist objects serving from a local HTTP server."""
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+pytest.importorskip('pytubefix')
+pytest.importorskip('pydub')
+
+from ytVideoDownloader import YouTubeDownloader  # noqa: E402
+
+VIDEO_IDS = [f'vid{index:08d}' for index in range(6)]
+
+
+def watch_url(video):
+    return f'https://www.youtube.com/watch?v={video}'
+
+
+class StubStream:
+    itag = 18
+
+    def __init__(self, yt):
+        self.yt = yt
+        self.title = yt.title
+        self.url = yt.server.base_url + '/' + yt.video
+        self.default_filename = yt.title + '.mp4'
+        self.filesize = len(yt.server.files.get('/' + yt.video, b''))
+
+    def download(self, output_path, filename=None):
+        with self.yt.lock:
+            self.yt.running[0] += 1
+            self.yt.peak[0] = max(self.yt.peak[0], self.yt.running[0])
+        try:
+            # Long enough for the workers to overlap
+            time.sleep(0.05)
+            path = os.path.join(output_path, filename or self.default_filename)
+            with urllib.request.urlopen(self.url) as response, open(path, 'wb') as f:
+                data = response.read()
+                f.write(data)
+            self.yt.on_progress(self, data, 0)
+            return path
+        finally:
+            with self.yt.lock:
+                self.yt.running[0] -= 1
+
+
+class StubStreams:
+    def __init__(self, yt):
+        self.yt = yt
+
+    def filter(self, **kwargs):
+        return self
+
+    def first(self):
+        return StubStream(self.yt)
+
+    def get_highest_resolution(self):
+        return StubStream(self.yt)
+
+
+@pytest.fixture
+def youtube_factory(range_server):
+    """Return a factory of stand-in YouTube objects; `created` lists the URLs it was called with."""
+    for video in VIDEO_IDS:
+        range_server.files['/' + video] = random.Random(video).randbytes(50_000)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+    created = []
+
+    class StubYouTube:
+        def __init__(self, url, on_progress_callback=None):
+            with lock:
+                created.append(url)
+            self.server = range_server
+            self.video = url.rsplit('=', 1)[1]
+            self.title = 'Video ' + self.video
+            self.on_progress = on_progress_callback
+            self.lock, self.running, self.peak = lock, running, peak
+
+        @property
+        def streams(self):
+            return StubStreams(self)
+
+    StubYouTube.created = created
+    StubYouTube.peak = peak
+    return StubYouTube
+
+
+class StubPlaylist:
+    title = 'Test list'
+
+    def __init__(self, url):
+        # The last video does not exist on the server
+        self.video_urls = [watch_url(video) for video in VIDEO_IDS] + [watch_url('missing0001')]
+
+
+def test_playlist_downloads_concurrently(range_server, youtube_factory, tmp_path):
+    downloader = YouTubeDownloader(str(tmp_path), workers=3, prefetch=0, youtube_factory=youtube_factory,
+                                   playlist_factory=StubPlaylist)
+
+    summary = downloader.process_playlist('https://www.youtube.com/playlist?list=PL1', 'v')
+
+    assert summary.title == 'Test list'
+    assert sorted(os.path.basename(path) for path in summary.downloaded) == [
+        f'Video {video}.mp4' for video in VIDEO_IDS
+    ]
+    for video in VIDEO_IDS:
+        with open(tmp_path / f'Video {video}.mp4', 'rb') as f:
+            assert f.read() == range_server.files['/' + video]
+    assert [url for url, _ in summary.failed] == [watch_url('missing0001')]
+    assert 1 < youtube_factory.peak[0] <= 3
+
+
+def test_playlist_reports_every_video(youtube_factory, tmp_path):
+    downloader = YouTubeDownloader(str(tmp_path), workers=2, prefetch=0, youtube_factory=youtube_factory,
+                                   playlist_factory=StubPlaylist)
+    records = []
+
+    downloader.process_playlist('https://www.youtube.com/playlist?list=PL1', 'v', on_result=records.append)
+
+    assert sorted(record['url'] for record in records) == sorted(StubPlaylist('').video_urls)
+    statuses = {record['url']: record['status'] for record in records}
+    assert statuses.pop(watch_url('missing0001')) == 'failed'
+    assert set(statuses.values()) == {'downloaded'}
+
+
+def test_playlist_that_cannot_be_loaded(youtube_factory, tmp_path):
+    def broken_playlist(url):
+        raise KeyError('contents')
+
+    downloader = YouTubeDownloader(str(tmp_path), youtube_factory=youtube_factory, playlist_factory=broken_playlist)
+
+    assert downloader.process_playlist('https://www.youtube.com/playlist?list=PL1', 'v') is None
+
+
+def test_single_video(youtube_factory, tmp_path):
+    downloader = YouTubeDownloader(str(tmp_path), youtube_factory=youtube_factory)
+
+    path = downloader.process_single_video(watch_url(VIDEO_IDS[0]), 'v')
+
+    assert path == str(tmp_path / f'Video {VIDEO_IDS[0]}.mp4')
+    assert downloader.process_single_video(watch_url('missing0001'), 'v') is None
+
+
+def test_temp_audio_files_do_not_collide(range_server, youtube_factory, tmp_path):
+    # The same video twice at once, as in a playlist that lists it twice
+    downloader = YouTubeDownloader(str(tmp_path), workers=2, youtube_factory=youtube_factory)
+    yt = youtube_factory(watch_url(VIDEO_IDS[0]), on_progress_callback=downloader.on_progress)
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(downloader._download_temp_audio(StubStream(yt))))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(paths)) == 2
+    for path in paths:
+        assert os.path.basename(path).startswith('temp_audio_')
+        with open(path, 'rb') as f:
+            assert f.read() == range_server.files['/' + VIDEO_IDS[0]]
+
+    missing = youtube_factory(watch_url('missing0001'), on_progress_callback=downloader.on_progress)
+    with pytest.raises(urllib.error.HTTPError):
+        downloader._download_temp_audio(StubStream(missing))
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in paths)
@@ -1,12 +1,27 @@
 import os
 import re
+import json
+import time
+import sqlite3
+import argparse
+import itertools
 import logging
-from typing import Optional, Tuple
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict, deque
+import http.client
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from pathlib import Path
 from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 from pytubefix import YouTube, Playlist
 from pytubefix.exceptions import PytubeFixError
 from pydub import AudioSegment
+from batchJobs import EXIT_USAGE, ResultWriter, iter_jobs
 
 # Configure logging
 logging.basicConfig(
@@ -15,18 +30,720 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class DownloadError(Exception):
+    """Raised when a video has no usable stream."""
+
+@dataclass
+class PlaylistSummary:
+    """Outcome of a playlist download."""
+    title: str
+    downloaded: List[str] = field(default_factory=list)
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    archived: List[str] = field(default_factory=list)
+
+    def log(self) -> None:
+        logger.info(f"Playlist '{self.title}' finished: {len(self.downloaded)} downloaded, "
+                    f"{len(self.archived)} already downloaded, {len(self.failed)} failed")
+        for video_url, error in self.failed:
+            logger.warning(f"  {video_url}: {error}")
+
+VIDEO_ID_REGEX = re.compile(r'(?:v=|youtu\.be/|embed/|v/|shorts/|live/)([0-9A-Za-z_-]{11})')
+
+def video_id(video_url: str) -> Optional[str]:
+    """Extract the 11 character video ID from a URL without contacting YouTube."""
+    match = VIDEO_ID_REGEX.search(video_url)
+    return match.group(1) if match else None
+
+def download_variant(download_type: str, **kwargs) -> str:
+    """Describe what is requested of a video, e.g. 'video:720p' or 'audio:mp3:192k'."""
+    if download_type == 'v':
+        return f"video:{kwargs.get('resolution') or 'highest'}"
+    return f"audio:{kwargs.get('audio_format', 'mp3')}:{kwargs.get('audio_bitrate') or 'default'}"
+
+class DownloadArchive:
+    """Finished downloads in a SQLite file, keyed by video ID and variant.
+
+    The itag of the stream that was used is stored with every entry. An entry
+    only counts while its file still exists with the recorded size, so deleted
+    or truncated downloads are fetched again.
+    """
+
+    def __init__(self, db_path: str):
+        # Written from the download and transcode threads
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS downloads (
+                video_id TEXT, variant TEXT, itag INTEGER,
+                path TEXT, size INTEGER, downloaded_at REAL,
+                PRIMARY KEY (video_id, variant)
+            );
+        ''')
+
+    def lookup(self, video_id: str, variant: str) -> Optional[str]:
+        """Return the path of a finished download that is still intact."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT path, size FROM downloads WHERE video_id = ? AND variant = ?", (video_id, variant)
+            ).fetchone()
+        if row is None:
+            return None
+        path, size = row
+        try:
+            if os.path.getsize(path) == size:
+                return path
+        except OSError:
+            pass
+        logger.info(f"Archived download of {video_id} is missing or incomplete, downloading again")
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM downloads WHERE video_id = ? AND variant = ?", (video_id, variant))
+        return None
+
+    def add(self, video_id: str, variant: str, itag: Optional[int], path: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO downloads (video_id, variant, itag, path, size, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, variant, itag, os.path.abspath(path), os.path.getsize(path), time.time())
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire `ttl` seconds after they were stored.
+
+    The least recently used entries are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 1000, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class MetadataPrefetcher:
+    """Resolve the metadata of upcoming playlist videos in the background.
+
+    When the download of video `index` starts, advance() queues the lookups
+    of the next `window` videos, which `window` threads run while the
+    downloads go on. Failed lookups are left to the download, which retries
+    them.
+    """
+
+    def __init__(self, resolve: Callable[[str], Any], video_urls: Sequence[str], window: int):
+        self.resolve = resolve
+        self.video_urls = video_urls
+        self.window = window
+        self._next = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='prefetch')
+
+    def advance(self, index: int) -> None:
+        with self._lock:
+            end = min(len(self.video_urls), index + 1 + self.window)
+            while self._next < end:
+                self._executor.submit(self._prefetch, self.video_urls[self._next])
+                self._next += 1
+
+    def _prefetch(self, video_url: str) -> None:
+        try:
+            self.resolve(video_url)
+        except Exception as e:
+            logger.debug(f"Prefetching {video_url} failed: {e}")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+class ConnectionPool:
+    """Keep-alive HTTP connections shared by all download threads.
+
+    A connection is taken with acquire() for one request and handed back with
+    release() once its response has been read completely. At most
+    `max_idle` connections per host are kept, and idle ones are closed
+    after `idle_timeout` seconds before the server drops them.
+    """
+
+    DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+    def __init__(self, timeout: float = 30, max_idle: int = 8, idle_timeout: float = 30):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.created = 0
+        self.reused = 0
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[float, http.client.HTTPConnection]]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, parts) -> http.client.HTTPConnection:
+        """Return a connection to the host of a urlsplit() result."""
+        key = (parts.scheme, (parts.hostname or '').lower(), parts.port or self.DEFAULT_PORTS.get(parts.scheme))
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                released, conn = idle.pop()
+                if now - released < self.idle_timeout:
+                    self.reused += 1
+                    return conn
+                conn.close()
+            self.created += 1
+        cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        return cls(key[1], key[2], timeout=self.timeout)
+
+    def release(self, conn: http.client.HTTPConnection) -> None:
+        """Keep a connection whose last response was read completely for the next request."""
+        scheme = 'https' if isinstance(conn, http.client.HTTPSConnection) else 'http'
+        key = (scheme, conn.host.lower(), conn.port)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((time.monotonic(), conn))
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for idle in self._idle.values():
+                for _, conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+class BandwidthScheduler:
+    """Global token bucket shared by all downloads, which get equal shares of it.
+
+    Tokens (bytes) are refilled at `rate` bytes per second, up to `burst`
+    (one second worth by default). When several downloads wait for tokens,
+    the one that received the fewest bytes goes first, so every download gets
+    the same bandwidth however many connections it uses. Without a rate only
+    the statistics are kept.
+    """
+
+    # Seconds of history behind the throughput in stats()
+    WINDOW = 5.0
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst or rate or 0
+        self.clock = clock
+        self.total = 0
+        self._tokens = self.burst
+        self._updated = self._started = clock()
+        self._granted: Dict[int, int] = {}
+        self._waiting: Dict[int, int] = {}
+        self._ids = itertools.count(1)
+        self._history: Deque[Tuple[float, int]] = deque()
+        self._condition = threading.Condition()
+
+    def register(self) -> int:
+        """Start a download and return its ID for consume()."""
+        with self._condition:
+            download = next(self._ids)
+            # Start level with the running downloads instead of catching up on their bytes
+            self._granted[download] = min(self._granted.values(), default=0)
+            return download
+
+    def unregister(self, download: int) -> None:
+        with self._condition:
+            self._granted.pop(download, None)
+            self._condition.notify_all()
+
+    def consume(self, download: int, amount: int) -> None:
+        """Wait until `amount` more bytes may be read for a registered download."""
+        with self._condition:
+            if self.rate:
+                self._waiting[download] = self._waiting.get(download, 0) + 1
+                try:
+                    needed = min(amount, self.burst)
+                    while True:
+                        now = self.clock()
+                        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                        self._updated = now
+                        first = min(self._waiting, key=self._granted.__getitem__)
+                        if first == download and self._tokens >= needed:
+                            break
+                        # Sleep until enough tokens are back, or until it is our turn
+                        self._condition.wait((needed - self._tokens) / self.rate if self._tokens < needed else None)
+                finally:
+                    self._waiting[download] -= 1
+                    if not self._waiting[download]:
+                        del self._waiting[download]
+                # Chunks larger than the burst leave a debt that is paid off by waiting
+                self._tokens -= amount
+                self._condition.notify_all()
+            self._granted[download] += amount
+            self.total += amount
+            self._history.append((self.clock(), amount))
+
+    def stats(self) -> Dict[str, float]:
+        """Current throughput (bytes/s), bytes so far, running downloads and chunks waiting for tokens."""
+        with self._condition:
+            now = self.clock()
+            while self._history and self._history[0][0] < now - self.WINDOW:
+                self._history.popleft()
+            window = min(self.WINDOW, max(now - self._started, 1e-9))
+            return {
+                'throughput': sum(amount for _, amount in self._history) / window,
+                'bytes': self.total,
+                'active': len(self._granted),
+                'waiting': sum(self._waiting.values())
+            }
+
+class SegmentedDownloader:
+    """Download a file as parallel HTTP range requests that can be resumed.
+
+    The file is split into segments of `segment_size` bytes which are fetched
+    by `connections` threads over keep-alive connections from `pool`. The
+    segments are written into a preallocated `<path>.part` file, and the
+    finished ones are recorded in `<path>.part.json`, so an interrupted
+    download only fetches the missing segments when started again. With a
+    `scheduler`, every chunk waits for its share of the bandwidth.
+    """
+
+    USER_AGENT = 'Mozilla/5.0'
+    MAX_REDIRECTS = 5
+
+    def __init__(
+        self,
+        connections: int = 4,
+        segment_size: int = 8 * 1024 * 1024,
+        chunk_size: int = 256 * 1024,
+        timeout: float = 30,
+        retries: int = 3,
+        pool: Optional[ConnectionPool] = None,
+        scheduler: Optional[BandwidthScheduler] = None
+    ):
+        self.connections = max(1, connections)
+        self.segment_size = segment_size
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.pool = pool if pool is not None else ConnectionPool(timeout)
+        self.scheduler = scheduler
+        self._write_lock = threading.Lock()
+
+    def _request(self, url: str, start: int, end: int) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send a range request for bytes start-end (inclusive), following redirects."""
+        for _ in range(self.MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            target = parts.path or '/'
+            if parts.query:
+                target += '?' + parts.query
+            conn = self.pool.acquire(parts)
+            try:
+                conn.request('GET', target, headers={
+                    'Range': f'bytes={start}-{end}',
+                    'User-Agent': self.USER_AGENT
+                })
+                response = conn.getresponse()
+            except BaseException:
+                # E.g. a keep-alive connection the server has closed, the caller retries
+                conn.close()
+                raise
+            if response.status in (301, 302, 303, 307, 308):
+                response.read()
+                self.pool.release(conn)
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            return conn, response
+        raise DownloadError(f"Too many redirects for {url}")
+
+    def content_length(self, url: str) -> int:
+        """Ask the server for the size of a file with a one-byte range request."""
+        conn, response = self._request(url, 0, 0)
+        response.read()
+        self.pool.release(conn)
+        content_range = response.getheader('Content-Range', '')
+        if response.status != 206 or '/' not in content_range:
+            raise DownloadError("Server does not support range requests")
+        return int(content_range.rsplit('/', 1)[1])
+
+    def _read_range(self, url: str, start: int, end: int, download: Optional[int]) -> Iterator[bytes]:
+        """Yield bytes start-end (inclusive) of url, continuing after errors where they stopped."""
+        position = start
+        for attempt in range(1, self.retries + 1):
+            conn = None
+            try:
+                conn, response = self._request(url, position, end)
+                if response.status != 206:
+                    response.read()
+                    raise DownloadError(f"Range request failed with HTTP {response.status}")
+                while position <= end:
+                    size = min(self.chunk_size, end - position + 1)
+                    if self.scheduler is not None:
+                        self.scheduler.consume(download, size)
+                    chunk = response.read(size)
+                    if not chunk:
+                        raise DownloadError(f"Connection closed at byte {position} of segment {start}-{end}")
+                    position += len(chunk)
+                    yield chunk
+                # Reusable once the response is consumed
+                response.read()
+                self.pool.release(conn)
+                return
+            except (OSError, http.client.HTTPException, DownloadError) as e:
+                if conn is not None:
+                    conn.close()
+                if attempt == self.retries:
+                    raise
+                logger.debug(f"Retrying segment {start}-{end} from byte {position} ({attempt}/{self.retries}): {e}")
+            except BaseException:
+                if conn is not None:
+                    conn.close()
+                raise
+
+    def _write_at(self, fd: int, data: bytes, offset: int) -> None:
+        if hasattr(os, 'pwrite'):
+            os.pwrite(fd, data, offset)
+        else:
+            # No positional writes on Windows
+            with self._write_lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                os.write(fd, data)
+
+    def _fetch_segment(self, url: str, fd: int, start: int, end: int,
+                       on_progress: Optional[Callable[[int], None]], download: Optional[int]) -> None:
+        position = start
+        for chunk in self._read_range(url, start, end, download):
+            self._write_at(fd, chunk, position)
+            position += len(chunk)
+            if on_progress:
+                on_progress(len(chunk))
+
+    def _register(self) -> Optional[int]:
+        return self.scheduler.register() if self.scheduler is not None else None
+
+    def _unregister(self, download: Optional[int]) -> None:
+        if self.scheduler is not None:
+            self.scheduler.unregister(download)
+
+    def iter_chunks(self, url: str, size: int, on_progress: Optional[Callable[[int], None]] = None) -> Iterator[bytes]:
+        """Yield the content of url in order, one range request per segment."""
+        download = self._register()
+        try:
+            for start in range(0, size, self.segment_size):
+                for chunk in self._read_range(url, start, min(start + self.segment_size, size) - 1, download):
+                    if on_progress:
+                        on_progress(len(chunk))
+                    yield chunk
+        finally:
+            self._unregister(download)
+
+    def _load_state(self, state_path: str, part_path: str, size: int) -> set:
+        """Return the finished segments of an earlier attempt with the same size and layout."""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if (state.get('size') != size or state.get('segment_size') != self.segment_size
+                or not os.path.exists(part_path)):
+            return set()
+        return set(state.get('done', []))
+
+    def _save_state(self, state_path: str, size: int, done: set) -> None:
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'size': size, 'segment_size': self.segment_size, 'done': sorted(done)}, f)
+        os.replace(tmp_path, state_path)
+
+    def download(self, url: str, path: str, size: Optional[int] = None,
+                 on_progress: Optional[Callable[[int], None]] = None) -> str:
+        """Download url to path and return path.
+
+        `on_progress` is called with the number of bytes of every chunk
+        written, and once up front with the bytes kept from an earlier attempt.
+        """
+        if size is None:
+            size = self.content_length(url)
+        part_path = path + '.part'
+        state_path = part_path + '.json'
+        segments = [(start, min(start + self.segment_size, size) - 1)
+                    for start in range(0, size, self.segment_size)]
+        done = self._load_state(state_path, part_path, size)
+        if done:
+            logger.info(f"Resuming {os.path.basename(path)}: {len(done)}/{len(segments)} segments present")
+            if on_progress:
+                on_progress(sum(segments[index][1] - segments[index][0] + 1 for index in done))
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+                if hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, size)
+                    except OSError:
+                        pass  # Not supported by the file system, the file stays sparse
+            lock = threading.Lock()
+            pending = [index for index in range(len(segments)) if index not in done]
+            download = self._register()
+            with ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix='segment') as executor:
+                futures = {
+                    executor.submit(self._fetch_segment, url, fd, *segments[index], on_progress, download): index
+                    for index in pending
+                }
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                        with lock:
+                            done.add(futures[future])
+                            self._save_state(state_path, size, done)
+                except BaseException:
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+                finally:
+                    self._unregister(download)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        actual = os.path.getsize(part_path)
+        if len(done) != len(segments) or actual != size:
+            raise DownloadError(f"Incomplete download of {path}: {actual} of {size} bytes")
+        os.replace(part_path, path)
+        os.remove(state_path)
+        return path
+
+# ffmpeg codec and muxer per output format
+AUDIO_FORMATS = {
+    'mp3': ('libmp3lame', 'mp3'),
+    'wav': ('pcm_s16le', 'wav'),
+    'flac': ('flac', 'flac'),
+    'm4a': ('aac', 'ipod'),
+    'aac': ('aac', 'adts'),
+    'ogg': ('libvorbis', 'ogg'),
+    'opus': ('libopus', 'opus'),
+}
+LOSSLESS_FORMATS = ('wav', 'flac')
+
+def transcode_audio(
+    source: Union[str, Iterable[bytes]],
+    output_path: str,
+    audio_format: str = 'mp3',
+    bitrate: Optional[str] = None
+) -> str:
+    """Convert a file, or an iterable of chunks piped into ffmpeg, to an audio format.
+
+    ffmpeg decodes and encodes as the data arrives, so memory use does not
+    depend on the length of the stream. The output is written under a
+    temporary name and only replaces output_path when ffmpeg succeeded.
+    """
+    if audio_format not in AUDIO_FORMATS:
+        raise DownloadError(f"Unsupported audio format: {audio_format}")
+    codec, muxer = AUDIO_FORMATS[audio_format]
+    partial_path = output_path + '.part'
+    # Uses the ffmpeg binary pydub was configured with
+    command = [AudioSegment.converter, '-hide_banner', '-loglevel', 'error', '-y',
+               '-i', source if isinstance(source, str) else 'pipe:0', '-vn', '-c:a', codec]
+    if bitrate and audio_format not in LOSSLESS_FORMATS:
+        command += ['-b:a', bitrate]
+    command += ['-f', muxer, partial_path]
+
+    # A file as stderr cannot fill up and block ffmpeg while we write to it
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL if isinstance(source, str) else subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr
+            )
+        except OSError as e:
+            raise DownloadError(f"Cannot run ffmpeg: {e}")
+        try:
+            if not isinstance(source, str):
+                try:
+                    for chunk in source:
+                        process.stdin.write(chunk)
+                except BrokenPipeError:
+                    pass  # ffmpeg exited early, its error output tells why
+                finally:
+                    try:
+                        process.stdin.close()
+                    except BrokenPipeError:
+                        pass
+            returncode = process.wait()
+        except BaseException:
+            process.kill()
+            process.wait()
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        if returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode(errors='replace').strip().splitlines()
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise DownloadError(f"ffmpeg failed: {message[-1] if message else f'exit code {returncode}'}")
+
+    os.replace(partial_path, output_path)
+    return output_path
+
+class StageStats:
+    """Files, bytes and time of one pipeline stage, updated from several threads."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.files = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, started: float, size: int) -> None:
+        """Record one file of `size` bytes processed since `started` (time.perf_counter)."""
+        finished = time.perf_counter()
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            self.busy += finished - started
+            self.first = started if self.first is None else min(self.first, started)
+            self.last = finished if self.last is None else max(self.last, finished)
+
+    def summary(self) -> str:
+        if not self.files:
+            return f"{self.name}: no files"
+        elapsed = max(self.last - self.first, 1e-9)
+        return (f"{self.name}: {self.files} files, {self.bytes / 1e6:.1f} MB in {elapsed:.1f} s "
+                f"({self.bytes / 1e6 / elapsed:.2f} MB/s, {self.files / elapsed:.2f} files/s, "
+                f"{self.busy:.1f} s busy)")
+
+class TranscodePipeline:
+    """Convert downloaded audio files while the next ones are downloading.
+
+    `transcoders` ffmpeg processes (one per CPU core by default) run at the
+    same time. Download threads reserve() a slot before fetching a file and
+    the slot is freed when its conversion is done, so at most `backlog` temp
+    files exist at a time and slow conversions hold back the downloads
+    instead of filling the disk.
+    """
+
+    def __init__(self, transcoders: Optional[int] = None, backlog: Optional[int] = None):
+        self.transcoders = transcoders or os.cpu_count() or 1
+        self.backlog = backlog or self.transcoders * 2
+        self.executor = ThreadPoolExecutor(max_workers=self.transcoders, thread_name_prefix='transcode')
+        self.downloads = StageStats('Download')
+        self.conversions = StageStats('Transcode')
+        self.waited = 0.0
+        self._slots = threading.BoundedSemaphore(self.backlog)
+        self._lock = threading.Lock()
+
+    def reserve(self) -> None:
+        """Wait until there is room for one more downloaded file."""
+        started = time.perf_counter()
+        self._slots.acquire()
+        with self._lock:
+            self.waited += time.perf_counter() - started
+
+    def release(self) -> None:
+        self._slots.release()
+
+    def submit(self, temp_file: str, output_path: str, audio_format: str, bitrate: Optional[str]) -> Future:
+        """Queue the conversion of a reserved temp file, which is removed afterwards."""
+        return self.executor.submit(self._convert, temp_file, output_path, audio_format, bitrate)
+
+    def _convert(self, temp_file: str, output_path: str, audio_format: str, bitrate: Optional[str]) -> str:
+        started = time.perf_counter()
+        try:
+            size = os.path.getsize(temp_file)
+            transcode_audio(temp_file, output_path, audio_format, bitrate)
+            self.conversions.add(started, size)
+            return output_path
+        finally:
+            os.remove(temp_file)
+            self.release()
+
+    def log_summary(self) -> None:
+        logger.info(self.downloads.summary())
+        logger.info(self.conversions.summary())
+        logger.info(f"Downloads waited {self.waited:.1f} s for the {self.transcoders} transcoders")
+
+    def close(self) -> None:
+        # Queued conversions still run, so that their temp files are removed
+        self.executor.shutdown(wait=True)
+
 class YouTubeDownloader:
-    def __init__(self, output_dir: Optional[str] = None):
-        """Initialize the downloader with an optional output directory."""
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        workers: int = 1,
+        connections: int = 1,
+        transcoders: Optional[int] = None,
+        archive: Optional[DownloadArchive] = None,
+        scheduler: Optional[BandwidthScheduler] = None,
+        prefetch: Optional[int] = None,
+        manifest_cache: Optional[TTLCache] = None,
+        youtube_factory: Callable[..., YouTube] = YouTube,
+        playlist_factory: Callable[[str], Playlist] = Playlist
+    ):
+        """Initialize the downloader with an optional output directory.
+
+        `workers` videos of a playlist are downloaded at the same time, and
+        with more than one of `connections` every large stream is fetched as
+        parallel range requests that can be resumed. Audio of playlists is
+        converted by `transcoders` ffmpeg processes (default: one per CPU core)
+        while the downloads continue. Videos recorded in `archive` are skipped
+        before anything is requested from YouTube. Titles and stream manifests
+        of the next `prefetch` playlist videos (default: twice the workers,
+        0 disables it) are looked up ahead of their downloads and kept in
+        `manifest_cache`. With a `scheduler`, all streams are fetched by
+        SegmentedDownloader over one shared connection pool and share its
+        bandwidth limit. The factories create the
+        YouTube and Playlist objects and can be replaced, e.g. by stand-ins
+        serving local test data.
+        """
         self.output_dir = output_dir or os.getcwd()
+        self.workers = max(1, workers)
+        self.pool = ConnectionPool()
+        self.scheduler = scheduler
+        self.segmented = SegmentedDownloader(connections, pool=self.pool, scheduler=scheduler) \
+            if connections > 1 or scheduler is not None else None
+        self.transcoders = transcoders
+        self.archive = archive
+        self.prefetch = 2 * self.workers if prefetch is None else prefetch
+        self.manifest_cache = manifest_cache if manifest_cache is not None else TTLCache()
+        # Lookups in progress, so a download waits for its prefetch instead of repeating it
+        self._resolving: Dict[str, Future] = {}
+        self._resolving_lock = threading.Lock()
+        self.youtube_factory = youtube_factory
+        self.playlist_factory = playlist_factory
+        # Progress bar and screen line of the download running in each thread
+        self._local = threading.local()
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
 
     def is_valid_link(self, link: str) -> bool:
         """Validate if the provided link is a valid YouTube URL."""
         youtube_regex = (
             r'(https?://)?(www\.)?'
-            '(youtube|youtu|youtube-nocookie)\.(com|be)/'
-            '(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})'
+            r'(youtube|youtu|youtube-nocookie)\.(com|be)/'
+            r'(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})'
         )
         return bool(re.match(youtube_regex, link))
 
@@ -34,100 +751,515 @@ class YouTubeDownloader:
         """Check if the link is a YouTube playlist."""
         return 'playlist' in link
 
-    def on_progress(self, stream, chunk: bytes, bytes_remaining: int):
-        """Callback function to update download progress."""
-        if not hasattr(self, 'progress_bar'):
-            self.progress_bar = tqdm(
+    def _progress_bar(self, stream) -> tqdm:
+        """Return the progress bar of the download running in this thread."""
+        progress_bar = getattr(self._local, 'progress_bar', None)
+        if progress_bar is None:
+            title = getattr(stream, 'title', None) or ''
+            progress_bar = self._local.progress_bar = tqdm(
                 total=stream.filesize,
                 unit='iB',
-                unit_scale=True
+                unit_scale=True,
+                desc=title[:30] or None,
+                position=getattr(self._local, 'position', None),
+                # Bars of concurrent downloads reuse their line
+                leave=self.workers == 1
             )
-        self.progress_bar.update(len(chunk))
+        return progress_bar
+
+    def on_progress(self, stream, chunk: bytes, bytes_remaining: int):
+        """Callback function to update download progress."""
+        self._progress_bar(stream).update(len(chunk))
 
-    def download_video(self, yt: YouTube, resolution: Optional[str] = None) -> Optional[str]:
+    def _close_progress(self) -> None:
+        progress_bar = getattr(self._local, 'progress_bar', None)
+        if progress_bar is not None:
+            progress_bar.close()
+            self._local.progress_bar = None
+
+    def _progress_counter(self, stream) -> Callable[[int], None]:
+        """Return a callback adding byte counts to this thread's bar, from any thread."""
+        progress_bar = self._progress_bar(stream)
+        lock = threading.Lock()
+
+        def on_progress(count: int) -> None:
+            with lock:
+                progress_bar.update(count)
+
+        return on_progress
+
+    def download_stream(self, stream, filename: Optional[str] = None) -> str:
+        """Download a stream to the output directory, in segments if enabled.
+
+        The file is named after the stream's title unless `filename` is given.
+        """
+        if self.segmented is None or (self.scheduler is None and stream.filesize < self.segmented.segment_size):
+            if filename is None:
+                return stream.download(output_path=self.output_dir)
+            return stream.download(output_path=self.output_dir, filename=filename)
+
+        path = os.path.join(self.output_dir, filename or stream.default_filename)
+        if os.path.isfile(path) and os.path.getsize(path) == stream.filesize:
+            return path
+        # The segment threads report to the bar of the calling thread
+        return self.segmented.download(stream.url, path, stream.filesize, self._progress_counter(stream))
+
+    def download_video(self, yt: YouTube, resolution: Optional[str] = None) -> str:
         """Download video with specified resolution or highest available."""
-        try:
-            if resolution:
-                stream = yt.streams.filter(res=resolution).first()
-            else:
-                stream = yt.streams.get_highest_resolution()
+        if resolution:
+            stream = yt.streams.filter(res=resolution).first()
+        else:
+            stream = yt.streams.get_highest_resolution()
 
-            if not stream:
-                logger.warning("Requested resolution not available. Using highest available.")
-                stream = yt.streams.get_highest_resolution()
+        if not stream:
+            logger.warning("Requested resolution not available. Using highest available.")
+            stream = yt.streams.get_highest_resolution()
+        if not stream:
+            raise DownloadError("No video stream available")
 
-            logger.info(f"Downloading video: {yt.title}")
-            out_file = stream.download(output_path=self.output_dir)
-            return out_file
-        except PytubeFixError as e:
-            logger.error(f"Error downloading video: {str(e)}")
-            return None
+        logger.info(f"Downloading video: {yt.title}")
+        self._local.stream = stream
+        return self.download_stream(stream)
+
+    def _download_temp_audio(self, stream) -> str:
+        """Download a stream to a temp file of its own, which is removed if the download fails.
 
-    def download_audio(self, yt: YouTube, audio_format: str = 'mp3') -> Optional[str]:
-        """Download and convert audio to specified format."""
+        Named by mkstemp rather than after the title, so playlist entries with
+        the same title or the same video listed twice can run concurrently.
+        """
+        fd, temp_file = tempfile.mkstemp(prefix='temp_audio_', suffix=os.path.splitext(stream.default_filename)[1],
+                                         dir=self.output_dir)
+        os.close(fd)
         try:
-            stream = yt.streams.get_audio_only()
-            if not stream:
-                logger.error("No audio stream available")
-                return None
+            return self.download_stream(stream, filename=os.path.basename(temp_file))
+        except BaseException:
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+            raise
+
+    def download_audio(self, yt: YouTube, audio_format: str = 'mp3', bitrate: Optional[str] = None) -> str:
+        """Download and convert audio to specified format.
+
+        The download is piped into ffmpeg and converted while it is running.
+        """
+        stream = yt.streams.get_audio_only()
+        if not stream:
+            raise DownloadError("No audio stream available")
+        self._local.stream = stream
+
+        logger.info(f"Downloading audio: {yt.title}")
+        output_path = os.path.join(
+            self.output_dir,
+            f"{yt.title}.{audio_format}"
+        )
 
+        if (self.segmented is not None and self.segmented.connections > 1
+                and stream.filesize >= self.segmented.segment_size):
+            # Segments arrive out of order, so convert once the file is complete
+            temp_file = self._download_temp_audio(stream)
+            try:
+                return transcode_audio(temp_file, output_path, audio_format, bitrate)
+            finally:
+                # Clean up temporary file
+                os.remove(temp_file)
+        if self.scheduler is not None:
+            chunks = self.segmented.iter_chunks(stream.url, stream.filesize, self._progress_counter(stream))
+        else:
+            # iter_chunks reports to on_progress like stream.download
+            chunks = stream.iter_chunks()
+        return transcode_audio(chunks, output_path, audio_format, bitrate)
+
+    def stats(self) -> Dict[str, float]:
+        """Live download statistics: throughput (bytes/s), bytes, active and waiting downloads, connections."""
+        stats = self.scheduler.stats() if self.scheduler is not None else {}
+        stats['connections_created'] = self.pool.created
+        stats['connections_reused'] = self.pool.reused
+        return stats
+
+    def fetch_audio(self, yt: YouTube, pipeline: TranscodePipeline, audio_format: str = 'mp3',
+                    bitrate: Optional[str] = None) -> Future:
+        """Download audio to a temp file and queue its conversion on the pipeline."""
+        if audio_format not in AUDIO_FORMATS:
+            raise DownloadError(f"Unsupported audio format: {audio_format}")
+        stream = yt.streams.get_audio_only()
+        if not stream:
+            raise DownloadError("No audio stream available")
+        self._local.stream = stream
+
+        output_path = os.path.join(
+            self.output_dir,
+            f"{yt.title}.{audio_format}"
+        )
+        pipeline.reserve()
+        try:
             logger.info(f"Downloading audio: {yt.title}")
-            temp_file = stream.download(
-                output_path=self.output_dir,
-                filename_prefix="temp_audio_"
-            )
+            started = time.perf_counter()
+            temp_file = self._download_temp_audio(stream)
+            pipeline.downloads.add(started, os.path.getsize(temp_file))
+        except BaseException:
+            pipeline.release()
+            raise
+        return pipeline.submit(temp_file, output_path, audio_format, bitrate)
+
+    def resolve(self, video_url: str) -> YouTube:
+        """Return the YouTube object of a video with its title and streams fetched.
+
+        Comes from the manifest cache while fresh, and waits for a lookup of
+        the same video already running in another thread.
+        """
+        with self._resolving_lock:
+            yt = self.manifest_cache.get(video_url)
+            if yt is not None:
+                return yt
+            future = self._resolving.get(video_url)
+            running = future is not None
+            if not running:
+                future = self._resolving[video_url] = Future()
+        if running:
+            return future.result()
 
-            # Convert to desired audio format
-            output_path = os.path.join(
-                self.output_dir,
-                f"{yt.title}.{audio_format}"
+        try:
+            yt = self.youtube_factory(
+                video_url,
+                on_progress_callback=self.on_progress
             )
-            
-            # Convert to MP3 using pydub
-            audio = AudioSegment.from_file(temp_file)
-            audio.export(output_path, format="mp3")
-            
-            # Clean up temporary file
-            os.remove(temp_file)
-            return output_path
-        except Exception as e:
-            logger.error(f"Error processing audio: {str(e)}")
+            # pytubefix fetches both lazily on first access
+            yt.title
+            yt.streams
+        except BaseException as e:
+            with self._resolving_lock:
+                del self._resolving[video_url]
+            future.set_exception(e)
+            raise
+        with self._resolving_lock:
+            self.manifest_cache.put(video_url, yt)
+            del self._resolving[video_url]
+        future.set_result(yt)
+        return yt
+
+    def download(self, video_url: str, download_type: str, pipeline: Optional[TranscodePipeline] = None,
+                 **kwargs) -> Union[str, Future]:
+        """Download a single video URL, raising on failure.
+
+        With a pipeline, audio is returned as the Future of its conversion.
+        """
+        if download_type not in ('v', 'a'):
+            raise ValueError("Invalid download type specified")
+        self._local.stream = None
+        try:
+            yt = self.resolve(video_url)
+            if download_type == 'v':
+                result = self.download_video(yt, kwargs.get('resolution'))
+            elif pipeline is not None:
+                result = self.fetch_audio(yt, pipeline, kwargs.get('audio_format', 'mp3'), kwargs.get('audio_bitrate'))
+            else:
+                result = self.download_audio(yt, kwargs.get('audio_format', 'mp3'), kwargs.get('audio_bitrate'))
+        finally:
+            self._close_progress()
+
+        video = video_id(video_url)
+        if self.archive is not None and video:
+            variant = download_variant(download_type, **kwargs)
+            itag = getattr(self._local.stream, 'itag', None)
+            if isinstance(result, Future):
+                result.add_done_callback(
+                    lambda future: future.exception() is None
+                    and self.archive.add(video, variant, itag, future.result())
+                )
+            else:
+                self.archive.add(video, variant, itag, result)
+        return result
+
+    def archived(self, video_url: str, download_type: str, **kwargs) -> Optional[str]:
+        """Return the file of an earlier download of the same video and variant, if intact."""
+        video = video_id(video_url)
+        if self.archive is None or not video:
             return None
+        return self.archive.lookup(video, download_variant(download_type, **kwargs))
+
+    def process_playlist(self, playlist_url: str, download_type: str,
+                         on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         **kwargs) -> Optional[PlaylistSummary]:
+        """Process all videos in a playlist, `self.workers` at a time.
 
-    def process_playlist(self, playlist_url: str, download_type: str, **kwargs) -> None:
-        """Process all videos in a playlist."""
+        Audio is converted on a TranscodePipeline, so the download threads
+        move on to the next video while earlier ones are converted.
+        `on_result` is called with a record of every video as soon as it
+        is downloaded, skipped as archived or failed.
+        """
         try:
-            playlist = Playlist(playlist_url)
-            logger.info(f"Downloading playlist: {playlist.title}")
-            
-            for video_url in playlist.video_urls:
-                self.process_single_video(video_url, download_type, **kwargs)
+            playlist = self.playlist_factory(playlist_url)
+            video_urls = list(playlist.video_urls)
+            summary = PlaylistSummary(playlist.title)
         except Exception as e:
             logger.error(f"Error processing playlist: {str(e)}")
+            return None
+
+        logger.info(f"Downloading playlist: {summary.title} ({len(video_urls)} videos)")
+        report = on_result or (lambda record: None)
+        if self.archive is not None:
+            remaining = []
+            for video_url in video_urls:
+                path = self.archived(video_url, download_type, **kwargs)
+                if path:
+                    summary.archived.append(path)
+                    report({'url': video_url, 'status': 'archived', 'path': path})
+                else:
+                    remaining.append(video_url)
+            if summary.archived:
+                logger.info(f"Skipping {len(summary.archived)} videos already in the download archive")
+            video_urls = remaining
+        # Line 0 is the playlist bar, every worker thread gets its own line below
+        positions = itertools.count(1)
+        lock = threading.Lock()
+        pipeline = TranscodePipeline(self.transcoders, self.workers + (self.transcoders or os.cpu_count() or 1)) \
+            if download_type == 'a' else None
+
+        prefetcher = MetadataPrefetcher(self.resolve, video_urls, self.prefetch) if self.prefetch else None
+        started = itertools.count(1)
+        queued = len(video_urls)
+        stop_stats = threading.Event()
+
+        def show_stats(total_bar: tqdm) -> None:
+            while not stop_stats.wait(1):
+                stats = self.stats()
+                total_bar.set_postfix_str(
+                    f"{stats['throughput'] / 1e6:.2f} MB/s, {stats['active']} active, "
+                    f"{stats['waiting']} waiting for bandwidth, {queued} queued"
+                )
+
+        def download(index: int, video_url: str) -> Union[str, Future]:
+            nonlocal queued
+            if not hasattr(self._local, 'position'):
+                with lock:
+                    self._local.position = next(positions)
+            with lock:
+                queued = len(video_urls) - next(started)
+            if prefetcher is not None:
+                prefetcher.advance(index)
+            return self.download(video_url, download_type, pipeline, **kwargs)
+
+        try:
+            with logging_redirect_tqdm(), \
+                    tqdm(total=len(video_urls), unit='video', desc='Playlist', position=0) as total_bar, \
+                    ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='download') as executor:
+                pending = {
+                    executor.submit(download, index, video_url): video_url
+                    for index, video_url in enumerate(video_urls)
+                }
+                if self.scheduler is not None:
+                    threading.Thread(target=show_stats, args=(total_bar,), name='stats', daemon=True).start()
+                try:
+                    while pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            video_url = pending.pop(future)
+                            try:
+                                result = future.result()
+                            except Exception as e:
+                                logger.error(f"Error processing video {video_url}: {str(e)}")
+                                summary.failed.append((video_url, str(e) or type(e).__name__))
+                                report({'url': video_url, 'status': 'failed', 'error': summary.failed[-1][1]})
+                            else:
+                                if isinstance(result, Future):
+                                    # Downloaded, wait for the conversion
+                                    pending[result] = video_url
+                                    continue
+                                summary.downloaded.append(result)
+                                report({'url': video_url, 'status': 'downloaded', 'path': result})
+                            total_bar.update(1)
+                except KeyboardInterrupt:
+                    # Let the running downloads finish, drop the queued ones
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+        finally:
+            stop_stats.set()
+            if prefetcher is not None:
+                prefetcher.close()
+            if pipeline is not None:
+                pipeline.close()
+
+        summary.log()
+        if pipeline is not None:
+            pipeline.log_summary()
+        if self.scheduler is not None:
+            stats = self.stats()
+            logger.info(f"Transferred {stats['bytes'] / 1e6:.1f} MB over {stats['connections_created']} "
+                        f"connections, reused {stats['connections_reused']} times")
+        return summary
 
     def process_single_video(self, video_url: str, download_type: str, **kwargs) -> Optional[str]:
         """Process a single video URL."""
         try:
-            yt = YouTube(
-                video_url,
-                on_progress_callback=self.on_progress
-            )
-            
-            if download_type == 'v':
-                return self.download_video(yt, kwargs.get('resolution'))
-            elif download_type == 'a':
-                return self.download_audio(yt, kwargs.get('audio_format', 'mp3'))
-            else:
-                logger.error("Invalid download type specified")
-                return None
-                
+            path = self.archived(video_url, download_type, **kwargs)
+            if path:
+                logger.info(f"Already downloaded: {path}")
+                return path
+            return self.download(video_url, download_type, **kwargs)
+        except (PytubeFixError, DownloadError) as e:
+            logger.error(f"Error downloading video: {str(e)}")
+            return None
         except Exception as e:
             logger.error(f"Error processing video: {str(e)}")
             return None
 
+# Options a --batch job may set for itself
+BATCH_OPTIONS = {'type': str, 'resolution': str, 'audio_format': str, 'audio_bitrate': str}
+
+def batch_request(job: Dict[str, Any], args: argparse.Namespace) -> Tuple[str, Dict[str, Any]]:
+    """Return the download type and options of a batch job, the CLI options filling in what it leaves out."""
+    download_type = job.get('type', args.type)
+    if download_type not in ('video', 'audio'):
+        raise ValueError(f"Invalid type: {download_type}, expected video or audio")
+    if download_type == 'video':
+        return 'v', {'resolution': job.get('resolution', args.resolution)}
+    audio_format = job.get('audio_format', args.audio_format)
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Invalid audio format: {audio_format}, expected one of {', '.join(AUDIO_FORMATS)}")
+    return 'a', {'audio_format': audio_format, 'audio_bitrate': job.get('audio_bitrate', args.audio_bitrate)}
+
+def run_batch(downloader: YouTubeDownloader, args: argparse.Namespace) -> int:
+    """Download the URLs listed in args.batch without prompting and return the exit code.
+
+    Single videos are downloaded `downloader.workers` at a time and only that
+    many jobs are read ahead. A playlist waits for the single videos before
+    it and then runs alone with its own workers, so no more than
+    `downloader.workers` downloads run at once. One JSON line per video is
+    written to args.results as soon as it is done, then a summary line. The exit code is 1 when a video or job
+    failed, 2 when the jobs could not be read.
+    """
+    try:
+        writer = ResultWriter(args.results, failed_statuses=('failed', 'error'))
+    except OSError as e:
+        logger.error(f"Cannot write results to {args.results}: {e}")
+        return EXIT_USAGE
+
+    # Lines 0 to workers belong to the bars of playlist jobs
+    positions = itertools.count(downloader.workers + 1)
+    lock = threading.Lock()
+
+    def download(number: int, video_url: str, download_type: str, kwargs: Dict[str, Any]) -> None:
+        if not hasattr(downloader._local, 'position'):
+            with lock:
+                downloader._local.position = next(positions)
+        record = {'job': number, 'url': video_url}
+        try:
+            path = downloader.archived(video_url, download_type, **kwargs)
+            if path:
+                record.update(status='archived', path=path)
+            else:
+                record.update(status='downloaded', path=downloader.download(video_url, download_type, **kwargs))
+        except Exception as e:
+            logger.error(f"Error downloading video {video_url}: {str(e)}")
+            record.update(status='failed', error=str(e) or type(e).__name__)
+        writer.write(record)
+
+    exit_code = None
+    with ThreadPoolExecutor(max_workers=downloader.workers, thread_name_prefix='batch') as executor:
+        pending = set()
+        try:
+            for number, job, error in iter_jobs(args.batch, 'url', BATCH_OPTIONS):
+                if error is None:
+                    link = job['url']
+                    try:
+                        download_type, kwargs = batch_request(job, args)
+                    except ValueError as e:
+                        error = str(e)
+                    else:
+                        # The video URL check does not cover playlist URLs, a bad one fails to load below
+                        if not (downloader.is_playlist(link) or downloader.is_valid_link(link)):
+                            error = 'Invalid YouTube URL'
+                if error is not None:
+                    logger.error(f"Job {number}: {error}")
+                    writer.write({'job': number, **({'url': job['url']} if job else {}),
+                                  'status': 'error', 'error': error})
+                    continue
+
+                if downloader.is_playlist(link):
+                    wait(pending)
+                    pending.clear()
+                    summary = downloader.process_playlist(
+                        link, download_type,
+                        on_result=lambda record: writer.write({'job': number, 'playlist': link, **record}),
+                        **kwargs
+                    )
+                    if summary is None:
+                        writer.write({'job': number, 'url': link, 'status': 'error',
+                                      'error': 'Cannot load playlist'})
+                    continue
+
+                # Read no further ahead than the workers can take
+                while len(pending) >= downloader.workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(download, number, link, download_type, kwargs))
+        except OSError as e:
+            logger.error(f"Cannot read jobs from {args.batch}: {e}")
+            exit_code = EXIT_USAGE
+        except KeyboardInterrupt:
+            # Let the running downloads finish and report them, drop the rest
+            executor.shutdown(wait=True, cancel_futures=True)
+            writer.close()
+            raise
+    result = writer.close()
+    return result if exit_code is None else exit_code
+
 def main():
-    downloader = YouTubeDownloader()
-    
+    parser = argparse.ArgumentParser(description='Download YouTube videos, playlists or their audio')
+    parser.add_argument('-o', '--output-dir', help='Folder for the downloads (default: current folder)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of playlist videos downloaded at the same time (default: 1)')
+    parser.add_argument('-c', '--connections', type=int, default=1,
+                        help='Download each large stream over this many connections in resumable '
+                             'segments (default: 1, a single request)')
+    parser.add_argument('-T', '--transcoders', type=int,
+                        help='Number of ffmpeg processes converting playlist audio (default: CPU cores)')
+    parser.add_argument('-b', '--audio-bitrate', metavar='BITRATE',
+                        help='Bitrate of converted audio, e.g. 192k (default: encoder default)')
+    parser.add_argument('--prefetch', type=int, metavar='N',
+                        help='Look up titles and streams of the next N playlist videos ahead of their '
+                             'downloads (default: twice the workers, 0 disables it)')
+    parser.add_argument('--rate-limit', type=float, metavar='MBPS',
+                        help='Limit the total bandwidth of all downloads to this many MB/s, '
+                             'shared equally between the running downloads')
+    parser.add_argument('--archive', metavar='PATH',
+                        help='SQLite file recording finished downloads, which are skipped on later runs')
+    parser.add_argument('--batch', metavar='JOBS',
+                        help="Download the video and playlist URLs listed in this file ('-' for stdin) without "
+                             'prompting; a line is a URL or a JSON object with "url" and optionally "type", '
+                             '"resolution", "audio_format" and "audio_bitrate"')
+    parser.add_argument('--results', default='-', metavar='PATH',
+                        help='Append the JSON line results of --batch to this file (default: stdout)')
+    parser.add_argument('--type', choices=['video', 'audio'], default='video',
+                        help='What --batch jobs download unless they say otherwise (default: video)')
+    parser.add_argument('--resolution',
+                        help='Resolution of --batch video jobs, e.g. 720p (default: highest)')
+    parser.add_argument('--audio-format', choices=AUDIO_FORMATS, default='mp3',
+                        help='Format of --batch audio jobs (default: mp3)')
+    args = parser.parse_args()
+
+    archive = DownloadArchive(args.archive) if args.archive else None
+    scheduler = BandwidthScheduler(args.rate_limit * 1e6) if args.rate_limit else None
+    downloader = YouTubeDownloader(
+        args.output_dir,
+        workers=args.workers,
+        connections=args.connections,
+        transcoders=args.transcoders,
+        archive=archive,
+        prefetch=args.prefetch,
+        scheduler=scheduler
+    )
+
+    if args.batch:
+        try:
+            exit_code = run_batch(downloader, args)
+        finally:
+            if archive is not None:
+                archive.close()
+            downloader.pool.close()
+        raise SystemExit(exit_code)
+
     while True:
         try:
             link = input("\nEnter YouTube video/playlist URL (or 'exit' to quit): ").strip()
@@ -147,8 +1279,13 @@ def main():
                 resolution = input("Enter desired resolution (e.g., 720p, 1080p) or press Enter for highest: ").strip()
                 kwargs = {'resolution': resolution if resolution else None}
             else:
-                audio_format = input("Enter audio format (mp3/wav) or press Enter for mp3: ").strip() or 'mp3'
-                kwargs = {'audio_format': audio_format}
+                audio_format = input(
+                    f"Enter audio format ({'/'.join(AUDIO_FORMATS)}) or press Enter for mp3: "
+                ).strip().lower() or 'mp3'
+                if audio_format not in AUDIO_FORMATS:
+                    logger.error(f"Invalid audio format. Please enter one of: {', '.join(AUDIO_FORMATS)}.")
+                    continue
+                kwargs = {'audio_format': audio_format, 'audio_bitrate': args.audio_bitrate}
 
             if downloader.is_playlist(link):
                 downloader.process_playlist(link, download_type, **kwargs)
@@ -163,5 +1300,9 @@ def main():
         except Exception as e:
             logger.error(f"An unexpected error occurred: {str(e)}")
 
+    if archive is not None:
+        archive.close()
+    downloader.pool.close()
+
 if __name__ == "__main__":
     main()